@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本處理流程的效能測試
+以 data/ 中的實際文本，分別計時 parse_structured_text、tokenize_han、tokenize_rom、
+align_tokens 以及完整的 merge_and_generate_json，每個階段先熱身再重複執行
+
+用法:
+    python scripts/benchmark_pipeline.py                    # 測試並與基準比較
+    python scripts/benchmark_pipeline.py --save-baseline    # 測試並寫入基準
+    python scripts/benchmark_pipeline.py --threshold 0.2    # 超過基準 20% 視為退步
+
+與基準比較時，任何階段退步超過門檻，結束碼為 1
+"""
+
+import io
+import gc
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import contextlib
+import tempfile
+import unicodedata
+from pathlib import Path
+from book_info import ALL_BOOKS
+from parse_text_v4 import (
+    parse_structured_text, tokenize_han, tokenize_rom, align_tokens, strip_markup,
+    merge_and_generate_json
+)
+
+DEFAULT_BASELINE_FILE = 'data/benchmark-baseline.json'
+DEFAULT_THRESHOLD = 0.15
+
+
+def time_stage(func, repeat, warmup):
+    """執行 warmup 次熱身後再執行 repeat 次，返回每次的秒數"""
+    for _ in range(warmup):
+        func()
+
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def collect_verses(han_data, rom_data):
+    """返回：(所有漢字節文, 所有羅馬字節文, 兩邊都有的 (漢字, 羅馬字) 節文)"""
+    def verses(data):
+        return {
+            (book, chapter_num, verse_num): text
+            for book, book_data in data.items()
+            for chapter_num, chapter in book_data['chapters'].items()
+            for verse_num, text in chapter['verses'].items()
+        }
+
+    han_verses = verses(han_data)
+    rom_verses = verses(rom_data)
+
+    # 羅馬字書名 → 漢字書名，與 merge_and_generate_json 相同的配對方式
+    rom_to_han = {
+        unicodedata.normalize('NFC', rom): unicodedata.normalize('NFC', han)
+        for rom, han, eng, page in ALL_BOOKS
+    }
+    pairs = []
+    for (book, chapter_num, verse_num), rom_text in rom_verses.items():
+        han_text = han_verses.get((rom_to_han.get(book), chapter_num, verse_num))
+        if han_text and rom_text:
+            pairs.append((han_text, rom_text))
+
+    return list(han_verses.values()), list(rom_verses.values()), pairs
+
+
+def build_stages(han_file, rom_file, output_dir):
+    """
+    output_dir: merge_and_generate_json 的輸出目錄（不寫到 website/public/）
+    返回：[(階段名稱, 無參數函式), ...]
+    """
+    han_data = parse_structured_text(han_file)
+    rom_data = parse_structured_text(rom_file)
+    han_texts, rom_texts, pairs = collect_verses(han_data, rom_data)
+
+    def run_tokenize_han():
+        for text in han_texts:
+            tokenize_han(text)
+
+    def run_tokenize_rom():
+        for text in rom_texts:
+            tokenize_rom(text)
+
+    def run_strip_markup():
+        for text in han_texts:
+            strip_markup(text)
+
+    def run_align_tokens():
+        for han_text, rom_text in pairs:
+            align_tokens(han_text, rom_text)
+
+    def run_merge():
+        with contextlib.redirect_stdout(io.StringIO()):
+            merge_and_generate_json(han_data, rom_data, str(Path(output_dir) / 'bible_data.json'), publish=False,
+                                    search_dir=str(Path(output_dir) / 'search'))
+
+    def run_full_build():
+        with contextlib.redirect_stdout(io.StringIO()):
+            merge_and_generate_json(parse_structured_text(han_file), parse_structured_text(rom_file),
+                                    str(Path(output_dir) / 'bible_data.json'), publish=False,
+                                    search_dir=str(Path(output_dir) / 'search'))
+
+    print(f"  漢字節數: {len(han_texts)}，羅馬字節數: {len(rom_texts)}，對齊節數: {len(pairs)}")
+
+    return [
+        ('parse_structured_text(han)', lambda: parse_structured_text(han_file)),
+        ('parse_structured_text(rom)', lambda: parse_structured_text(rom_file)),
+        ('strip_markup', run_strip_markup),
+        ('tokenize_han', run_tokenize_han),
+        ('tokenize_rom', run_tokenize_rom),
+        ('align_tokens', run_align_tokens),
+        ('merge_and_generate_json', run_merge),
+        ('full_build', run_full_build),
+    ]
+
+
+def summarize(times):
+    return {
+        'median': statistics.median(times),
+        'min': min(times),
+        'max': max(times),
+        'runs': len(times),
+    }
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """返回：退步的階段 [(名稱, 基準秒數, 本次秒數), ...]（以中位數比較）"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('stages', {}).get(name)
+        if not base:
+            continue
+        if result['median'] > base['median'] * (1 + threshold):
+            regressions.append((name, base['median'], result['median']))
+    return regressions
+
+
+def print_table(results, baseline=None):
+    print(f"\n{'階段':<30}{'中位數 (ms)':>14}{'最小 (ms)':>12}{'基準 (ms)':>12}{'變化':>10}")
+    for name, result in results.items():
+        line = f"{name:<30}{result['median'] * 1000:>14.2f}{result['min'] * 1000:>12.2f}"
+        base = baseline.get('stages', {}).get(name) if baseline else None
+        if base:
+            change = result['median'] / base['median'] - 1
+            line += f"{base['median'] * 1000:>12.2f}{change:>+10.1%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文本處理流程效能測試')
+    parser.add_argument('--han-file', default='data/han.txt')
+    parser.add_argument('--rom-file', default='data/rom.txt')
+    parser.add_argument('--repeat', type=int, default=7, help='每個階段重複次數（預設 7）')
+    parser.add_argument('--warmup', type=int, default=2, help='每個階段熱身次數（預設 2）')
+    parser.add_argument('--stage', action='append', help='只測試指定階段（可重複）')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_FILE, help='基準檔案')
+    parser.add_argument('--save-baseline', action='store_true', help='將本次結果寫入基準檔案')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'中位數超過基準多少比例視為退步（預設 {DEFAULT_THRESHOLD}）')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='hinghua-bench-') as output_dir:
+        print("準備測試資料...")
+        stages = build_stages(args.han_file, args.rom_file, output_dir)
+        if args.stage:
+            unknown = set(args.stage) - {name for name, _ in stages}
+            if unknown:
+                print(f"[ERROR] 未知的階段: {', '.join(sorted(unknown))}")
+                sys.exit(2)
+            stages = [(name, func) for name, func in stages if name in args.stage]
+
+        for name, func in stages:
+            print(f"  測試中: {name}")
+            results[name] = summarize(time_stage(func, args.repeat, args.warmup))
+
+    baseline_path = Path(args.baseline)
+    baseline = None
+    if not args.save_baseline and baseline_path.exists():
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        data = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'repeat': args.repeat,
+            'warmup': args.warmup,
+            'stages': results,
+        }
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"\n[OK] 已寫入基準: {baseline_path}")
+        return
+
+    if baseline is None:
+        print(f"\n找不到基準檔案 {baseline_path}，請先執行 --save-baseline")
+        return
+
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n[!] 以下階段比基準慢超過 {args.threshold:.0%}:")
+        for name, base, current in regressions:
+            print(f"  {name}: {base * 1000:.2f} ms → {current * 1000:.2f} ms")
+        sys.exit(1)
+
+    print(f"\n[OK] 沒有階段比基準慢超過 {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,10 @@
 包含羅馬字、漢字、英文名稱及起始頁碼
 """
 
+import unicodedata
+from bisect import bisect_right
+from rom_normalize import fold_text
+
 # 【序言】
 FOREWORD_BOOKS = [
     ('Foreword', 'Foreword', 'Foreword', 3),
@@ -92,6 +96,64 @@ ALL_BOOKS = FOREWORD_BOOKS + OLD_TESTAMENT_BOOKS + NEW_TESTAMENT_BOOKS
 ROM_TO_HAN = {rom: han for rom, han, eng, page in ALL_BOOKS}
 HAN_TO_ROM = {han: rom for rom, han, eng, page in ALL_BOOKS}
 HAN_TO_ENG = {han: eng for rom, han, eng, page in ALL_BOOKS}
+# 英文書名 → 書卷索引（0-based，ALL_BOOKS 順序）
+ENG_TO_INDEX = {eng: i for i, (rom, han, eng, page) in enumerate(ALL_BOOKS)}
+
+class BookCatalog:
+    """
+    書卷查詢（模組載入時建立一次）
+    - 書名查詢：羅馬字、漢字、英文名稱皆可，先比對 NFC 正規化後的名稱，
+      再比對去掉附加符號與聲調的羅馬字（見 rom_normalize.py），
+      例如 OCR 結果中的 Cho̤̍ng-sa̤̍-gi̍ 與 ALL_BOOKS 的 Cho̤̍ng-sa̤-gi̍ 視為同一卷
+    - 頁碼查詢：以起始頁二分搜尋
+    """
+
+    def __init__(self, books):
+        self.books = list(books)
+        self.start_pages = [book[3] for book in self.books]
+        if self.start_pages != sorted(self.start_pages):
+            raise ValueError("書卷起始頁必須由小到大排列")
+
+        self._exact = {}
+        self._folded = {}
+        ambiguous = set()
+        for i, (rom, han, english, start_page) in enumerate(self.books):
+            for name in (rom, han, english):
+                self._exact.setdefault(unicodedata.normalize('NFC', name), i)
+            for name in (rom, english):
+                key = fold_text(name)
+                if self._folded.get(key, i) != i:
+                    ambiguous.add(key)
+                self._folded[key] = i
+        # 摺疊後相同的名稱無法分辨，只能用原名查詢
+        for key in ambiguous:
+            del self._folded[key]
+
+    def index_of(self, name: str):
+        """書名（羅馬字 / 漢字 / 英文）→ 書卷索引（0-based），找不到時返回 None"""
+        index = self._exact.get(unicodedata.normalize('NFC', name))
+        if index is None:
+            index = self._folded.get(fold_text(name))
+        return index
+
+    def find(self, name: str):
+        """書名 → (羅馬字, 漢字, 英文, 起始頁) 或 None"""
+        index = self.index_of(name)
+        return self.books[index] if index is not None else None
+
+    def index_by_page(self, page_num: int):
+        """頁碼 → 書卷索引（0-based），在第一卷之前時返回 None"""
+        index = bisect_right(self.start_pages, page_num) - 1
+        return index if index >= 0 else None
+
+    def book_by_page(self, page_num: int):
+        """頁碼 → (羅馬字, 漢字, 英文, 起始頁) 或 None"""
+        index = self.index_by_page(page_num)
+        return self.books[index] if index is not None else None
+
+
+CATALOG = BookCatalog(ALL_BOOKS)
+
 
 def get_book_by_page(page_num: int):
     """
@@ -103,35 +165,15 @@ def get_book_by_page(page_num: int):
     Returns:
         (羅馬字, 漢字, 英文, 起始頁) 或 None
     """
-    for i, book in enumerate(ALL_BOOKS):
-        rom, han, english, start_page = book
-
-        # 檢查下一卷的起始頁
-        if i < len(ALL_BOOKS) - 1:
-            next_start = ALL_BOOKS[i + 1][3]
-            if start_page <= page_num < next_start:
-                return book
-        else:
-            # 最後一卷
-            if page_num >= start_page:
-                return book
-
-    return None
+    return CATALOG.book_by_page(page_num)
 
 def get_book_index(page_num: int):
     """獲取書卷索引（0-based）"""
-    for i, book in enumerate(ALL_BOOKS):
-        rom, han, english, start_page = book
-
-        if i < len(ALL_BOOKS) - 1:
-            next_start = ALL_BOOKS[i + 1][3]
-            if start_page <= page_num < next_start:
-                return i
-        else:
-            if page_num >= start_page:
-                return i
+    return CATALOG.index_by_page(page_num)
 
-    return None
+def get_book_by_name(name: str):
+    """根據書名（羅馬字、漢字或英文，不分 NFC / NFD 及附加符號差異）獲取書卷資訊"""
+    return CATALOG.find(name)
 
 
 if __name__ == '__main__':
@@ -142,3 +184,9 @@ if __name__ == '__main__':
         book = get_book_by_page(page)
         if book:
             print(f"第 {page} 頁 → {book[1]} ({book[0]})")
+
+    # OCR 結果中的書名與 ALL_BOOKS 的附加符號不同，仍可查到
+    for name in ['Cho̤̍ng-sa̤̍-gi̍', '馬太', 'Revelation']:
+        book = get_book_by_name(name)
+        if book:
+            print(f"{name} → {book[1]} ({book[2]})")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+建置流程的計時工具
+記錄各階段（以及各書卷）的耗時與呼叫次數，並輸出依耗時排序的摘要表
+可選擇同時以 cProfile 記錄，寫出 pstats 檔
+
+用法：
+    profiler = BuildProfiler()
+    with profiler.stage('解析 han.txt'):
+        ...
+    align = profiler.wrap('align_tokens', align_tokens)
+    profiler.print_summary()
+
+未啟用時（BuildProfiler(enabled=False) 或 NULL_PROFILER）所有方法都不做事，可直接留在程式中
+"""
+
+import time
+import cProfile
+import contextlib
+
+
+class BuildProfiler:
+    def __init__(self, enabled=True, cprofile_output=None):
+        """
+        enabled: False 時不記錄任何資料
+        cprofile_output: pstats 輸出檔路徑，None 表示不使用 cProfile
+        """
+        self.enabled = enabled
+        self.cprofile_output = cprofile_output if enabled else None
+        self.stats = {}  # {名稱: [總秒數, 呼叫次數]}
+        self.started = time.perf_counter()
+        self._cprofile = None
+
+        if self.cprofile_output:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def record(self, name, seconds, calls=1):
+        """直接累計一筆耗時"""
+        if not self.enabled:
+            return
+        entry = self.stats.get(name)
+        if entry is None:
+            self.stats[name] = [seconds, calls]
+        else:
+            entry[0] += seconds
+            entry[1] += calls
+
+    def stage(self, name):
+        """計時區塊：with profiler.stage('名稱'): ..."""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._timed(name)
+
+    @contextlib.contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def wrap(self, name, func):
+        """包裝函式，每次呼叫都計入 name；未啟用時直接返回原函式"""
+        if not self.enabled:
+            return func
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+
+        return wrapper
+
+    def timed_iter(self, iterable, name):
+        """
+        逐項計時的迭代（適用於產生器，例如逐卷產生的書卷）
+        name(item): 每一項計入的名稱
+        """
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(iterable, name)
+
+    def _timed_iter(self, iterable, name):
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.record(name(item), time.perf_counter() - start)
+            yield item
+
+    def stop(self):
+        """停止 cProfile 並寫出 pstats 檔"""
+        if self._cprofile is None:
+            return
+        self._cprofile.disable()
+        self._cprofile.dump_stats(self.cprofile_output)
+        self._cprofile = None
+        print(f"\n  cProfile 結果已寫入: {self.cprofile_output}（可用 python -m pstats 檢視）")
+
+    def print_summary(self):
+        """依總耗時由大到小列出各階段"""
+        if not self.enabled:
+            return
+        self.stop()
+
+        wall = time.perf_counter() - self.started
+        print(f"\n{'階段':<40}{'次數':>8}{'總計 (ms)':>12}{'平均 (ms)':>12}{'佔比':>8}")
+        for name, (seconds, calls) in sorted(self.stats.items(), key=lambda item: item[1][0], reverse=True):
+            print(f"{name:<40}{calls:>8}{seconds * 1000:>12.1f}{seconds / calls * 1000:>12.2f}{seconds / wall:>8.1%}")
+        print(f"{'總耗時':<40}{'':>8}{wall * 1000:>12.1f}")
+
+
+NULL_PROFILER = BuildProfiler(enabled=False)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bible_data.json 的欄式（columnar）token 編碼
+每節的 tokens 不再是物件陣列，而是三個平行陣列：
+    {"han": [...], "rom": [...], "flags": [...]}
+flags 為小整數，打包 token 類型、form 與專名標記，可無損還原為原本的 token 物件
+
+用法: python scripts/columnar_tokens.py [bible_data.json]
+      比較原格式與欄式格式的檔案大小及解析時間
+"""
+
+import json
+import sys
+import time
+
+FORMAT_NAME = 'columnar'
+FORMAT_VERSION = 1
+
+# flags 位元配置
+# bit 0-1: token 類型
+TYPE_CODES = {'punct': 0, 'word': 1, 'char': 2, 'compound': 3}
+# bit 2-3: form（對齊後的 word 才有）
+FORM_CODES = {None: 0, 'single': 1, 'compound_single': 2, 'phrase': 3}
+# bit 4: 專名
+PROPER_NAME_FLAG = 1 << 4
+# bit 5: 未對齊的 token（只有 text 欄位，來自 tokenize_han / tokenize_rom）
+RAW_FLAG = 1 << 5
+
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+FORM_NAMES = {code: name for name, code in FORM_CODES.items()}
+
+
+def encode_tokens(tokens):
+    """token 物件陣列 → {"han": [...], "rom": [...], "flags": [...]}"""
+    han, rom, flags = [], [], []
+
+    for token in tokens:
+        token_type = token['type']
+        flag = TYPE_CODES[token_type] | (FORM_CODES[token.get('form')] << 2)
+        if token.get('proper_name'):
+            flag |= PROPER_NAME_FLAG
+
+        if 'text' in token:
+            # 未對齊：羅馬字詞放 rom 欄，其餘（漢字、標點、合音字）放 han 欄
+            flag |= RAW_FLAG
+            if token_type == 'word':
+                han.append('')
+                rom.append(token['text'])
+            else:
+                han.append(token['text'])
+                rom.append('')
+        else:
+            han.append(token['han'])
+            rom.append(token['rom'])
+
+        flags.append(flag)
+
+    return {'han': han, 'rom': rom, 'flags': flags}
+
+
+def decode_tokens(columns):
+    """encode_tokens 的逆運算，還原的物件欄位順序與 parse_text_v4 輸出一致"""
+    tokens = []
+
+    for han, rom, flag in zip(columns['han'], columns['rom'], columns['flags']):
+        token_type = TYPE_NAMES[flag & 0b11]
+
+        if flag & RAW_FLAG:
+            text = rom if token_type == 'word' else han
+            token = {'type': token_type, 'text': text}
+            if token_type == 'compound':
+                token['chars'] = list(text)
+        else:
+            token = {'type': token_type, 'han': han, 'rom': rom}
+            form = FORM_NAMES[(flag >> 2) & 0b11]
+            if form is not None:
+                token['form'] = form
+
+        if flag & PROPER_NAME_FLAG:
+            token['proper_name'] = True
+
+        tokens.append(token)
+
+    return tokens
+
+
+def _map_sections(books, convert):
+    """複製 books 結構，對每個 section 的 tokens 套用 convert"""
+    result = []
+    for book in books:
+        chapters = []
+        for chapter in book['chapters']:
+            sections = []
+            for section in chapter['sections']:
+                section = dict(section)
+                section['tokens'] = convert(section['tokens'])
+                sections.append(section)
+            chapters.append({**chapter, 'sections': sections})
+        result.append({**book, 'chapters': chapters})
+    return result
+
+
+def encode_books(books):
+    """books 陣列 → 欄式 books 陣列（不修改原資料）"""
+    return _map_sections(books, encode_tokens)
+
+
+def decode_books(books):
+    """欄式 books 陣列 → 原格式 books 陣列"""
+    return _map_sections(books, decode_tokens)
+
+
+def encode_corpus(data):
+    """{"books": [...]} → 欄式格式"""
+    return {'format': FORMAT_NAME, 'version': FORMAT_VERSION, 'books': encode_books(data['books'])}
+
+
+def decode_corpus(data):
+    """欄式格式 → {"books": [...]}；原格式直接返回"""
+    if data.get('format') != FORMAT_NAME:
+        return data
+    if data.get('version') != FORMAT_VERSION:
+        raise ValueError(f"不支援的欄式格式版本: {data.get('version')}")
+    return {'books': decode_books(data['books'])}
+
+
+def _time_parse(text, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        json.loads(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    input_file = sys.argv[1] if len(sys.argv) > 1 else 'data/bible_data.json'
+
+    with open(input_file, 'r', encoding='utf-8') as f:
+        data = decode_corpus(json.load(f))
+
+    compact = encode_corpus(data)
+    if decode_corpus(compact) != data:
+        print("[ERROR] 欄式格式還原結果與原資料不一致")
+        sys.exit(1)
+
+    variants = [
+        ('原格式 indent=2', json.dumps(data, ensure_ascii=False, indent=2)),
+        ('原格式 minified', json.dumps(data, ensure_ascii=False, separators=(',', ':'))),
+        ('欄式 indent=2', json.dumps(compact, ensure_ascii=False, indent=2)),
+        ('欄式 minified', json.dumps(compact, ensure_ascii=False, separators=(',', ':'))),
+    ]
+
+    base_size = len(variants[0][1].encode('utf-8'))
+    print(f"{'格式':<20}{'大小 (KB)':>12}{'比例':>9}{'json.loads (ms)':>18}")
+    for name, text in variants:
+        size = len(text.encode('utf-8'))
+        print(f"{name:<20}{size / 1024:>12.1f}{size / base_size:>9.1%}{_time_parse(text) * 1000:>18.2f}")
+
+    print("\n[OK] 還原檢查通過")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,269 @@
 # -*- coding: utf-8 -*-
 """
 Batch convert images from TIF to WebP format
+
+Pages are encoded in parallel (--workers) and incrementally: a state file in the
+output directory records each source's hash and the encoder settings, so pages
+whose source and settings are unchanged are skipped on the next run.
+
+With --select-encoder each page is encoded with every candidate in CANDIDATES
+(lossless WebP, 1-bit PNG, lossy WebP, AVIF when Pillow supports it); candidates
+whose SSIM against the source falls below --ssim are rejected and the smallest
+remaining one is kept, so the output extension varies per page.
+
+After converting, an image manifest (manifest.json in the output directory) lists
+every page with its file name, width, height, byte size, content hash and the
+previous / next page, so the viewer can reserve layout, prefetch neighbours and
+cache-bust only changed images without downloading them first.
+
+Usage: python scripts/convert_images.py [input_dir] [output_dir] [--workers N] [--force]
+                                        [--select-encoder] [--ssim 0.98] [--production]
+       python scripts/convert_images.py --manifest-only [image_dir]
 """
 
-from PIL import Image
+from PIL import Image, features
+import io
 import os
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from json_artifacts import write_json, print_size_report
+
+STATE_FILE = '.convert-state.json'
+STATE_VERSION = 1
+
+# Candidate encodings for --select-encoder: name -> (extension, Pillow save options, image mode)
+# Image mode None keeps the source mode; '1' thresholds to black and white first
+CANDIDATES = {
+    'webp-lossless': ('webp', {'format': 'WEBP', 'lossless': True}, None),
+    'png-1bit': ('png', {'format': 'PNG', 'optimize': True}, '1'),
+    'webp-q90': ('webp', {'format': 'WEBP', 'quality': 90}, None),
+    'avif-q80': ('avif', {'format': 'AVIF', 'quality': 80}, None),
+}
+# The lossless WebP candidate is the current format; savings are reported against it
+BASELINE = 'webp-lossless'
+# Pillow feature each format needs (AVIF support depends on how Pillow was built)
+FORMAT_FEATURES = {'WEBP': 'webp', 'PNG': 'zlib', 'AVIF': 'avif'}
+DEFAULT_SSIM_THRESHOLD = 0.98
+SSIM_BLOCK = 8
+
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+def file_hash(path: Path) -> str:
+    """Content hash of a file (blake2b, 128-bit hex)"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def encoder_settings(quality: int = 90, method: int = 6, select: bool = False,
+                     ssim_threshold: float = DEFAULT_SSIM_THRESHOLD) -> dict:
+    """
+    Pillow save() options for WebP, or the encoder-selection settings
+
+    Args:
+        quality: WebP quality (0-100, recommended 85-95, ignored for lossless)
+        method: Encoder effort (0 = fastest, 6 = slowest / smallest)
+        select: Try every available candidate and keep the smallest that passes the SSIM gate
+        ssim_threshold: Minimum SSIM against the source for a candidate to be accepted
+    """
+    if select:
+        candidates = [name for name, (ext, options, mode) in CANDIDATES.items()
+                      if features.check(FORMAT_FEATURES[options['format']])]
+        return {'select': candidates, 'ssim_threshold': ssim_threshold, 'method': method}
+    # For B/W images, use lossless mode
+    # (quality is not passed: Pillow would use it as lossless compression effort)
+    return {'format': 'WEBP', 'lossless': True, 'method': method}
+
+
+def ssim(reference: np.ndarray, candidate: np.ndarray, block: int = SSIM_BLOCK) -> float:
+    """
+    Mean SSIM of two grayscale images (uint8 arrays of equal shape)
+    Computed over non-overlapping block x block windows, which keeps memory at a
+    few copies of the page instead of the per-pixel Gaussian-window maps
+    """
+    height = reference.shape[0] // block * block
+    width = reference.shape[1] // block * block
+
+    def blocks(pixels):
+        return (pixels[:height, :width].astype(np.float32)
+                .reshape(height // block, block, width // block, block))
+
+    x, y = blocks(reference), blocks(candidate)
+    mean_x, mean_y = x.mean(axis=(1, 3)), y.mean(axis=(1, 3))
+    var_x, var_y = x.var(axis=(1, 3)), y.var(axis=(1, 3))
+    cov = (x * y).mean(axis=(1, 3)) - mean_x * mean_y
+
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    ssim_map = (((2 * mean_x * mean_y + c1) * (2 * cov + c2))
+                / ((mean_x ** 2 + mean_y ** 2 + c1) * (var_x + var_y + c2)))
+    return float(ssim_map.mean())
+
+
+def encode_candidate(img: Image.Image, name: str, method: int) -> bytes:
+    ext, options, mode = CANDIDATES[name]
+    options = dict(options)
+    if options['format'] == 'WEBP':
+        options['method'] = method
+    if mode == '1' and img.mode != '1':
+        img = img.convert('L').convert('1', dither=Image.Dither.NONE)
+    buffer = io.BytesIO()
+    img.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def select_encoding(img: Image.Image, settings: dict) -> tuple:
+    """
+    Encode img with every candidate and pick the smallest that passes the SSIM gate
+    SSIM is only computed for candidates smaller than the lossless baseline, smallest
+    first, stopping at the first one that passes
+
+    Returns:
+        (name, encoded bytes, {name: (size, ssim or None if not measured)}, baseline size)
+    """
+    encoded = {name: encode_candidate(img, name, settings['method']) for name in settings['select']}
+    results = {name: (len(data), None) for name, data in encoded.items()}
+    baseline_size = results[BASELINE][0] if BASELINE in results else None
+
+    reference = None
+    best = BASELINE if BASELINE in encoded else None
+    for name in sorted(encoded, key=lambda name: len(encoded[name])):
+        if name == BASELINE:
+            break
+        if reference is None:
+            reference = np.asarray(img.convert('L'))
+        with Image.open(io.BytesIO(encoded[name])) as decoded:
+            score = ssim(reference, np.asarray(decoded.convert('L')))
+        results[name] = (len(encoded[name]), score)
+        if score >= settings['ssim_threshold']:
+            best = name
+            break
+
+    if best is None:
+        raise ValueError('no candidate encoding passed the SSIM gate')
+    return best, encoded[best], results, baseline_size
+
+
+class ConversionState:
+    """
+    Per-output-directory record of what each output was encoded from:
+    {stem: {"source_hash", "source_size", "source_mtime_ns", "settings",
+            "output", "output_size", "encoding", "baseline_size"}}
+
+    The source is re-hashed only when its size or mtime changed since the last run.
+    """
+
+    def __init__(self, output_path: Path):
+        self.path = output_path / STATE_FILE
+        self.entries = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == STATE_VERSION:
+                    self.entries = data.get('entries', {})
+            except (OSError, ValueError) as e:
+                print(f"[WARN] Ignoring unreadable state file {self.path}: {e}")
+
+    def is_current(self, source: Path, output_path: Path, settings: dict) -> bool:
+        """True if the recorded output exists and was encoded from this source with these settings"""
+        entry = self.entries.get(source.stem)
+        if entry is None or entry.get('settings') != settings:
+            return False
+        try:
+            output_size = (output_path / entry.get('output', f"{source.stem}.webp")).stat().st_size
+        except FileNotFoundError:
+            return False
+        if output_size != entry.get('output_size'):
+            return False
+
+        stat = source.stat()
+        if stat.st_size == entry.get('source_size') and stat.st_mtime_ns == entry.get('source_mtime_ns'):
+            return True
+        # Touched but possibly unchanged (e.g. copied): fall back to the content hash
+        if file_hash(source) != entry.get('source_hash'):
+            return False
+        entry['source_size'] = stat.st_size
+        entry['source_mtime_ns'] = stat.st_mtime_ns
+        return True
+
+    def record(self, source: Path, settings: dict, result: dict):
+        """result: convert_one() return value"""
+        stat = source.stat()
+        self.entries[source.stem] = {
+            'source_hash': result['source_hash'],
+            'source_size': stat.st_size,
+            'source_mtime_ns': stat.st_mtime_ns,
+            'settings': settings,
+            'output': result['output'],
+            'output_size': result['output_size'],
+            'encoding': result['encoding'],
+            'baseline_size': result['baseline_size'],
+        }
+
+    def save(self):
+        """Write atomically (temp file + rename)"""
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': STATE_VERSION, 'entries': self.entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def convert_one(tif_file: Path, output_path: Path, settings: dict) -> dict:
+    """
+    Encode a single page (runs in a worker process when --workers > 1)
+
+    Returns:
+        {"source_hash", "original_size", "output", "output_size", "encoding",
+         "baseline_size" (lossless WebP size; None if not measured), "candidates" ({name: (size, ssim)})}
+    """
+    source_hash = file_hash(tif_file)
+
+    with Image.open(tif_file) as img:
+        if 'select' in settings:
+            encoding, data, candidates, baseline_size = select_encoding(img, settings)
+            ext = CANDIDATES[encoding][0]
+        else:
+            buffer = io.BytesIO()
+            img.save(buffer, **settings)
+            data = buffer.getvalue()
+            encoding, ext, candidates = BASELINE, 'webp', {}
+            baseline_size = len(data)
 
-def convert_tif_to_webp(input_dir: str, output_dir: str, quality: int = 90):
+    # Write to a temporary name first so an interrupted run never leaves a truncated file
+    output_file = output_path / f"{tif_file.stem}.{ext}"
+    tmp_file = output_file.with_name(output_file.name + '.tmp')
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, output_file)
+
+    # Remove this page's output from a previous run in another format
+    for other_ext in {ext for ext, options, mode in CANDIDATES.values()} - {ext}:
+        (output_path / f"{tif_file.stem}.{other_ext}").unlink(missing_ok=True)
+
+    return {
+        'source_hash': source_hash,
+        'original_size': tif_file.stat().st_size,
+        'output': output_file.name,
+        'output_size': len(data),
+        'encoding': encoding,
+        'baseline_size': baseline_size,
+        'candidates': candidates,
+    }
+
+
+def convert_tif_to_webp(input_dir: str, output_dir: str, quality: int = 90, method: int = 6,
+                        workers: int = 1, force: bool = False, select: bool = False,
+                        ssim_threshold: float = DEFAULT_SSIM_THRESHOLD, reference_dir: str = None,
+                        production: bool = False):
     """
     Batch convert TIF to WebP
 
@@ -16,6 +272,13 @@ def convert_tif_to_webp(input_dir: str, output_dir: str, quality: int = 90):
         input_dir: Input directory containing TIF files
         output_dir: Output directory for WebP files
         quality: WebP quality (0-100, recommended 85-95, ignored for lossless)
+        method: WebP encoder effort (0-6)
+        workers: Number of encoder processes (1 = encode in this process)
+        force: Re-encode every page even if its output is up to date
+        select: Pick the smallest candidate encoding per page that passes the SSIM gate
+        ssim_threshold: Minimum SSIM for a candidate encoding (with select)
+        reference_dir: Directory of currently published images to report savings against
+        production: Write the image manifest minified, with .gz / .br
     """
     input_path = Path(input_dir)
     output_path = Path(output_dir)
@@ -23,49 +286,208 @@ def convert_tif_to_webp(input_dir: str, output_dir: str, quality: int = 90):
 
     tif_files = sorted(list(input_path.glob('*.tif')), key=lambda x: x.stem)
     total = len(tif_files)
+    settings = encoder_settings(quality, method, select, ssim_threshold)
+    state = ConversionState(output_path)
 
-    print(f"Found {total} TIF files")
-    print(f"Converting to WebP (lossless mode)...\n")
+    pending = [tif_file for tif_file in tif_files
+               if force or not state.is_current(tif_file, output_path, settings)]
+    skipped = total - len(pending)
 
-    total_original_size = 0
-    total_webp_size = 0
+    print(f"Found {total} TIF files ({skipped} up to date, {len(pending)} to convert)")
+    if select:
+        print(f"Selecting encoders per page ({', '.join(settings['select'])}; SSIM >= {ssim_threshold}, "
+              f"{workers} worker(s))...\n")
+    else:
+        print(f"Converting to WebP (lossless mode, method={method}, {workers} worker(s))...\n")
 
-    for i, tif_file in enumerate(tif_files, 1):
-        try:
-            # Open TIF file
-            img = Image.open(tif_file)
+    total_original_size = 0
+    total_output_size = 0
+    converted = 0
+    failed = 0
+    started = time.perf_counter()
 
-            # Convert to WebP
-            webp_file = output_path / f"{tif_file.stem}.webp"
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if executor is None:
+            futures = None
+        else:
+            futures = [executor.submit(convert_one, tif_file, output_path, settings) for tif_file in pending]
 
-            # For B/W images, use lossless mode
-            img.save(webp_file, 'WEBP', lossless=True, method=6)
+        for i, tif_file in enumerate(pending, 1):
+            try:
+                if futures is None:
+                    result = convert_one(tif_file, output_path, settings)
+                else:
+                    result = futures[i - 1].result()
+            except Exception as e:
+                print(f"[ERROR] Failed to process {tif_file.name}: {e}")
+                failed += 1
+                continue
 
             # Statistics
-            original_size = tif_file.stat().st_size
-            webp_size = webp_file.stat().st_size
-
+            state.record(tif_file, settings, result)
+            original_size = result['original_size']
+            output_size = result['output_size']
             total_original_size += original_size
-            total_webp_size += webp_size
+            total_output_size += output_size
+            converted += 1
 
-            size_change = (webp_size / original_size - 1) * 100
+            size_change = (output_size / original_size - 1) * 100
 
-            if i % 100 == 0 or i == total:
-                print(f"[{i}/{total}] {tif_file.name}: {original_size/1024:.1f} KB -> {webp_size/1024:.1f} KB ({size_change:+.1f}%)")
+            if i % 100 == 0 or i == len(pending):
+                print(f"[{i}/{len(pending)}] {tif_file.name}: {original_size/1024:.1f} KB -> "
+                      f"{result['output']} {output_size/1024:.1f} KB ({size_change:+.1f}%)")
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        # Keep the record of pages finished so far, even if interrupted
+        state.save()
 
-        except Exception as e:
-            print(f"[ERROR] Failed to process {tif_file.name}: {e}")
+    elapsed = time.perf_counter() - started
 
     print("\n" + "="*60)
     print("[DONE] Conversion complete!")
-    print(f"Total original size: {total_original_size/1024/1024:.2f} MB")
-    print(f"Total WebP size: {total_webp_size/1024/1024:.2f} MB")
-    size_diff = (total_webp_size / total_original_size - 1) * 100
-    print(f"Size change: {size_diff:+.1f}%")
+    print(f"Converted: {converted}, skipped (up to date): {skipped}, failed: {failed}")
+    print(f"Elapsed: {elapsed:.1f} s ({converted / elapsed if elapsed else 0:.1f} pages/sec)")
+    if converted:
+        print(f"Total original size: {total_original_size/1024/1024:.2f} MB")
+        print(f"Total output size: {total_output_size/1024/1024:.2f} MB")
+        size_diff = (total_output_size / total_original_size - 1) * 100
+        print(f"Saved: {(total_original_size - total_output_size)/1024/1024:.2f} MB ({size_diff:+.1f}%)")
+
+    report_outputs(state, [tif_file.stem for tif_file in tif_files], reference_dir)
+    write_image_manifest(output_path, state, production=production)
+
+
+def report_outputs(state: ConversionState, stems: list, reference_dir: str = None):
+    """
+    Summarize the whole output directory from the state file: pages per encoding and
+    total size against lossless WebP (and the currently published images, if given)
+    """
+    entries = [state.entries[stem] for stem in stems if stem in state.entries]
+    if not entries:
+        return
+
+    by_encoding = {}
+    for entry in entries:
+        count, size = by_encoding.get(entry.get('encoding', BASELINE), (0, 0))
+        by_encoding[entry.get('encoding', BASELINE)] = (count + 1, size + entry['output_size'])
+
+    print(f"\n{'Encoding':<16}{'Pages':>8}{'MB':>10}")
+    for name, (count, size) in sorted(by_encoding.items()):
+        print(f"{name:<16}{count:>8}{size/1024/1024:>10.2f}")
+
+    output_total = sum(entry['output_size'] for entry in entries)
+    baseline_entries = [entry for entry in entries if entry.get('baseline_size')]
+    if len(baseline_entries) == len(entries):
+        baseline_total = sum(entry['baseline_size'] for entry in entries)
+        print(f"Lossless WebP: {baseline_total/1024/1024:.2f} MB -> output: {output_total/1024/1024:.2f} MB "
+              f"(saved {(baseline_total - output_total)/1024/1024:.2f} MB, "
+              f"{(1 - output_total / baseline_total) * 100:.1f}%)")
+
+    if reference_dir and Path(reference_dir).is_dir():
+        reference_total = 0
+        for stem in stems:
+            for path in Path(reference_dir).glob(f"{stem}.*"):
+                reference_total += path.stat().st_size
+        if reference_total:
+            print(f"Current images in {reference_dir}: {reference_total/1024/1024:.2f} MB -> "
+                  f"{output_total/1024/1024:.2f} MB (saved {(reference_total - output_total)/1024/1024:.2f} MB)")
+
+
+def build_image_manifest(image_dir: Path, state: ConversionState = None) -> dict:
+    """
+    Manifest of the page images in image_dir (one per numeric stem):
+    {
+        "version": 1, "page_count": 1485, "first_page": "0001", "last_page": "1485", "total_bytes": ...,
+        "pages": [
+            {"page": "0001", "file": "0001.webp", "width": 3980, "height": 5828,
+             "bytes": 159624, "hash": "<blake2b-128 hex>", "prev": null, "next": "0002"},
+            ...
+        ]
+    }
+    The file for a page is the one recorded in the conversion state; without a state
+    entry, the first existing file with a candidate extension (webp first)
+    """
+    extensions = list(dict.fromkeys(ext for ext, options, mode in CANDIDATES.values()))
+    files = {}
+    for path in image_dir.iterdir():
+        if path.stem.isdigit() and path.suffix[1:] in extensions:
+            files.setdefault(path.stem, []).append(path)
+
+    pages = []
+    for stem in sorted(files, key=int):
+        entry = state.entries.get(stem) if state is not None else None
+        if entry is not None and (image_dir / entry.get('output', '')).is_file():
+            path = image_dir / entry['output']
+        else:
+            path = min(files[stem], key=lambda p: extensions.index(p.suffix[1:]))
+        # Only the header is read for the dimensions
+        with Image.open(path) as img:
+            width, height = img.size
+        pages.append({'page': stem, 'file': path.name, 'width': width, 'height': height,
+                      'bytes': path.stat().st_size, 'hash': file_hash(path)})
+
+    for i, page in enumerate(pages):
+        page['prev'] = pages[i - 1]['page'] if i > 0 else None
+        page['next'] = pages[i + 1]['page'] if i + 1 < len(pages) else None
+
+    return {
+        'version': MANIFEST_VERSION,
+        'page_count': len(pages),
+        'first_page': pages[0]['page'] if pages else None,
+        'last_page': pages[-1]['page'] if pages else None,
+        'total_bytes': sum(page['bytes'] for page in pages),
+        'pages': pages,
+    }
+
+
+def write_image_manifest(image_dir: Path, state: ConversionState = None, production: bool = False) -> dict:
+    """Write image_dir/manifest.json and return the manifest"""
+    manifest = build_image_manifest(Path(image_dir), state)
+    manifest_file = Path(image_dir) / MANIFEST_FILE
+    print_size_report([write_json(manifest_file, manifest, production=production)])
+    print(f"\n[OK] Image manifest: {manifest_file} ({manifest['page_count']} pages, "
+          f"{manifest['total_bytes']/1024/1024:.2f} MB)")
+    return manifest
+
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Batch convert TIF scans to WebP')
+    parser.add_argument('input_dir', nargs='?', default='pics')
+    parser.add_argument('output_dir', nargs='?', default='pics_webp')
+    parser.add_argument('--workers', '-w', type=int, default=os.cpu_count() or 1,
+                        help='Number of encoder processes (default: CPU count)')
+    parser.add_argument('--method', type=int, default=6, choices=range(7),
+                        help='WebP encoder effort, 0 (fastest) to 6 (smallest, default)')
+    parser.add_argument('--force', action='store_true', help='Re-encode all pages')
+    parser.add_argument('--select-encoder', action='store_true',
+                        help='Try every candidate encoding per page and keep the smallest that passes --ssim')
+    parser.add_argument('--ssim', type=float, default=DEFAULT_SSIM_THRESHOLD,
+                        help=f'Minimum SSIM against the source (default {DEFAULT_SSIM_THRESHOLD})')
+    parser.add_argument('--reference-dir', default='website/public/images',
+                        help='Currently published images to report savings against')
+    parser.add_argument('--production', action='store_true',
+                        help='Write the image manifest minified, with .gz / .br')
+    parser.add_argument('--manifest-only', nargs='?', const='website/public/images', metavar='IMAGE_DIR',
+                        help='Only (re)write the image manifest for IMAGE_DIR (default: website/public/images)')
+    args = parser.parse_args()
+
+    if args.manifest_only:
+        image_dir = Path(args.manifest_only)
+        state = ConversionState(image_dir) if (image_dir / STATE_FILE).exists() else None
+        write_image_manifest(image_dir, state, production=args.production)
+        raise SystemExit(0)
+
     convert_tif_to_webp(
-        input_dir='pics',
-        output_dir='pics_webp',
-        quality=92  # Quality parameter (ignored for lossless mode)
+        input_dir=args.input_dir,
+        output_dir=args.output_dir,
+        quality=92,  # Quality parameter (ignored for lossless mode)
+        method=args.method,
+        workers=args.workers,
+        force=args.force,
+        select=args.select_encoder,
+        ssim_threshold=args.ssim,
+        reference_dir=args.reference_dir,
+        production=args.production,
     )
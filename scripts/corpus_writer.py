@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bible_data.json 的輸出
+逐卷寫出：每卷處理完就立即序列化並寫到所有目的地，記憶體中最多只保留一卷
+- StreamingCorpusWriter: 單一檔案 {"books": [...]}，內容與 json.dump(indent=2) 完全相同
+- ShardedCorpusWriter: 分冊輸出，每卷或每章一個檔案，另加 manifest.json
+production=True 時改為 minified，並產生 .gz / .br（見 json_artifacts.py）
+"""
+
+import os
+import json
+import shutil
+import unicodedata
+from pathlib import Path
+from book_info import ALL_BOOKS, ENG_TO_INDEX
+from columnar_tokens import FORMAT_NAME, FORMAT_VERSION, encode_books
+from json_artifacts import MINIFIED, remove_compressed, size_record, sum_records, write_json
+
+
+def _dumps(data, level):
+    """json.dumps(indent=2)，整段再縮排 level 層（字串內的換行已跳脫，可直接替換）"""
+    return json.dumps(data, ensure_ascii=False, indent=2).replace('\n', '\n' + '  ' * level)
+
+
+def _tmp_path(path):
+    return path.with_name(path.name + '.tmp')
+
+
+class StreamingCorpusWriter:
+    """
+    串流寫出 {"books": [...]}（compact 時為欄式格式）
+    先寫到各目的地的 .tmp 檔，close() 時才改名為正式檔名
+    """
+
+    def __init__(self, destinations, compact=False, production=False):
+        self.destinations = [Path(d) for d in destinations]
+        self.compact = compact
+        self.production = production
+        self.book_count = 0
+        self.pretty_size = 0  # production 時統計 indent=2 格式的大小，供報表比較
+        self.records = []
+        self.files = []
+
+        header = {'format': FORMAT_NAME, 'version': FORMAT_VERSION} if compact else {}
+        for dest in self.destinations:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            self.files.append(open(_tmp_path(dest), 'w', encoding='utf-8'))
+
+        self._emit('{\n', '{')
+        for key, value in header.items():
+            self._emit(f'  {json.dumps(key)}: {_dumps(value, 1)},\n',
+                       f'{json.dumps(key)}:{json.dumps(value, **MINIFIED)},')
+        self._emit('  "books": [', '"books":[')
+
+    def _emit(self, pretty, minified=None):
+        """寫出一段；production 時寫 minified 版本，並累計 indent=2 版本的大小"""
+        if self.production:
+            self.pretty_size += len(pretty.encode('utf-8'))
+            text = minified
+        else:
+            text = pretty
+        for f in self.files:
+            f.write(text)
+
+    def add_book(self, book):
+        if self.compact:
+            book = encode_books([book])[0]
+        separator = ',' if self.book_count else ''
+        self._emit(f'{separator}\n    {_dumps(book, 2)}',
+                   separator + json.dumps(book, **MINIFIED) if self.production else None)
+        self.book_count += 1
+
+    def close(self):
+        self._emit('\n  ]\n}' if self.book_count else ']\n}', ']}')
+        for f, dest in zip(self.files, self.destinations):
+            f.close()
+            os.replace(_tmp_path(dest), dest)
+        self.files = []
+
+        if self.production:
+            self.records = [size_record(dest, self.pretty_size) for dest in self.destinations]
+        else:
+            for dest in self.destinations:
+                remove_compressed(dest)
+
+    def abort(self):
+        """發生錯誤時移除暫存檔，保留原本的輸出"""
+        for f, dest in zip(self.files, self.destinations):
+            f.close()
+            _tmp_path(dest).unlink(missing_ok=True)
+        self.files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+class ShardedCorpusWriter:
+    """
+    分冊輸出：每卷（per_chapter 時為每章）一個 JSON 檔，另加 manifest.json
+    manifest 依 ALL_BOOKS 順序列出所有書卷的名稱、起始頁、章數與分冊網址
+    網址相對於 manifest.json 所在目錄；尚未錄入的書卷章數為 0
+    先全部寫到各目的地旁的暫存目錄，close() 時才換入正式目錄；
+    中途出錯時（abort）刪除暫存目錄，上一次的輸出保持不變
+    """
+
+    def __init__(self, destinations, per_chapter=False, compact=False, production=False):
+        self.destinations = [Path(d) for d in destinations]
+        self.per_chapter = per_chapter
+        self.compact = compact
+        self.production = production
+        self.book_count = 0
+        self.shard_count = 0
+        self.entries = {}  # {書卷索引: manifest 項目}
+        self.records = []
+        self._file_records = {dest: [] for dest in self.destinations}
+
+        for dest in self.destinations:
+            staging = _tmp_path(dest)
+            if staging.exists():
+                shutil.rmtree(staging)
+            staging.mkdir(parents=True)
+
+    def _write_file(self, dest, url, data):
+        record = write_json(_tmp_path(dest) / url, data, production=self.production)
+        if record:
+            self._file_records[dest].append(record)
+
+    def _write_shard(self, url, data):
+        for dest in self.destinations:
+            self._write_file(dest, url, data)
+        self.shard_count += 1
+
+    def add_book(self, book):
+        if self.compact:
+            book = encode_books([book])[0]
+
+        index = ENG_TO_INDEX[book['name_eng']]
+        entry = {'chapter_count': len(book['chapters'])}
+
+        if self.per_chapter:
+            entry['chapters'] = []
+            for chapter in book['chapters']:
+                url = f"chapters/{index:02d}/{chapter['chapter']:03d}.json"
+                self._write_shard(url, chapter)
+                entry['chapters'].append({"chapter": chapter['chapter'], "url": url})
+        else:
+            url = f"books/{index:02d}.json"
+            self._write_shard(url, book)
+            entry['url'] = url
+
+        self.entries[index] = entry
+        self.book_count += 1
+
+    def close(self):
+        manifest_books = []
+        for index, (rom_name, han_name, eng_name, page) in enumerate(ALL_BOOKS):
+            entry = {
+                "name_han": unicodedata.normalize('NFC', han_name),
+                "name_rom": unicodedata.normalize('NFC', rom_name),
+                "name_eng": eng_name,
+                "page": page,
+                "chapter_count": 0
+            }
+            if self.per_chapter:
+                entry['chapters'] = []
+            else:
+                entry['url'] = None
+            entry.update(self.entries.get(index, {}))
+            manifest_books.append(entry)
+
+        manifest = {"shard": "chapter" if self.per_chapter else "book", "books": manifest_books}
+        if self.compact:
+            manifest['format'] = FORMAT_NAME
+            manifest['version'] = FORMAT_VERSION
+
+        for dest in self.destinations:
+            self._write_file(dest, 'manifest.json', manifest)
+        for dest in self.destinations:
+            _swap_in(_tmp_path(dest), dest)
+
+        if self.production:
+            self.records = [sum_records(f"{dest}/ ({len(records)} 個檔案)", records)
+                            for dest, records in self._file_records.items()]
+
+    def __enter__(self):
+        return self
+
+    def abort(self):
+        """捨棄暫存目錄，保留上一次的輸出"""
+        for dest in self.destinations:
+            shutil.rmtree(_tmp_path(dest), ignore_errors=True)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+# 分冊輸出擁有的項目；目的地目錄中的其他檔案換入時原樣保留
+_SHARD_ENTRIES = {'books', 'chapters', 'manifest.json', 'manifest.json.gz', 'manifest.json.br'}
+
+
+def _swap_in(staging, dest):
+    """以暫存目錄取代 dest：把 dest 中不屬於分冊輸出的項目移入暫存目錄，再以改名換入"""
+    old = dest.with_name(dest.name + '.old')
+    if old.exists():
+        shutil.rmtree(old)
+
+    if dest.exists():
+        for child in dest.iterdir():
+            if child.name not in _SHARD_ENTRIES:
+                os.replace(child, staging / child.name)
+        os.replace(dest, old)
+    os.replace(staging, dest)
+
+    if old.exists():
+        shutil.rmtree(old)
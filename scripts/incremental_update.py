@@ -7,7 +7,7 @@
 
 import re
 import sys
-from parse_text_v4 import parse_structured_text
+from parse_text_v4 import iter_structured_text
 
 def normalize_text(text):
     """
@@ -32,6 +32,18 @@ def get_verse_key(book, chapter, verse):
     return f"{book}:{chapter}:{verse}"
 
 
+def collect_verses(file_path):
+    """
+    串流讀取文本，建立經節索引 {key: text}
+    不建立完整的書卷/章節樹
+    """
+    verses = {}
+    for event in iter_structured_text(file_path):
+        if event.kind == 'verse':
+            verses[get_verse_key(event.book, event.chapter, event.verse)] = event.text
+    return verses
+
+
 def compare_versions(old_file, new_file):
     """
     比對新舊版本
@@ -42,29 +54,12 @@ def compare_versions(old_file, new_file):
         'deleted': [(key, text), ...]
     }
     """
+    # 建立經節索引 {key: text}
     print(f"解析舊版本: {old_file}")
-    old_data = parse_structured_text(old_file)
+    old_verses = collect_verses(old_file)
 
     print(f"解析新版本: {new_file}")
-    new_data = parse_structured_text(new_file)
-
-    # 建立經節索引
-    old_verses = {}  # {key: text}
-    new_verses = {}  # {key: text}
-
-    # 提取舊版本的所有經節
-    for book_name, book_data in old_data.items():
-        for chapter_num, chapter_data in book_data['chapters'].items():
-            for verse_num, verse_text in chapter_data['verses'].items():
-                key = get_verse_key(book_name, chapter_num, verse_num)
-                old_verses[key] = verse_text
-
-    # 提取新版本的所有經節
-    for book_name, book_data in new_data.items():
-        for chapter_num, chapter_data in book_data['chapters'].items():
-            for verse_num, verse_text in chapter_data['verses'].items():
-                key = get_verse_key(book_name, chapter_num, verse_num)
-                new_verses[key] = verse_text
+    new_verses = collect_verses(new_file)
 
     # 比對
     unchanged = []
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成 JSON 檔的正式版（production）輸出
+- 壓縮空白的 JSON（minified）
+- 同目錄下的 .gz / .br 預壓縮檔（最高壓縮等級，內容固定，不含時間戳）
+  靜態主機可直接提供最小的編碼，不必即時壓縮
+
+用法: python scripts/json_artifacts.py <檔案.json> [...]
+      將既有的 JSON 檔改寫為正式版輸出並列出大小
+"""
+
+import os
+import sys
+import gzip
+import json
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # pip install brotli；未安裝時不產生 .br
+
+MINIFIED = {'ensure_ascii': False, 'separators': (',', ':')}
+PRETTY = {'ensure_ascii': False, 'indent': 2}
+
+_warned_no_brotli = False
+
+
+def _replace_bytes(path, data):
+    """先寫暫存檔再改名"""
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def compress_file(path):
+    """
+    產生 path.gz 與 path.br
+    返回：{'.gz': 大小, '.br': 大小或 None}
+    """
+    global _warned_no_brotli
+    path = Path(path)
+    data = path.read_bytes()
+
+    gz_data = gzip.compress(data, compresslevel=9, mtime=0)
+    _replace_bytes(path.with_name(path.name + '.gz'), gz_data)
+    sizes = {'.gz': len(gz_data), '.br': None}
+
+    if brotli is not None:
+        br_data = brotli.compress(data, quality=11)
+        _replace_bytes(path.with_name(path.name + '.br'), br_data)
+        sizes['.br'] = len(br_data)
+    elif not _warned_no_brotli:
+        print("  警告: 未安裝 brotli，略過 .br 輸出（pip install brotli）")
+        _warned_no_brotli = True
+
+    return sizes
+
+
+def remove_compressed(path):
+    """移除舊的 .gz / .br，避免主機提供過期的壓縮檔"""
+    path = Path(path)
+    for suffix in ('.gz', '.br'):
+        path.with_name(path.name + suffix).unlink(missing_ok=True)
+
+
+def write_json(path, data, production=False, compress=True):
+    """
+    寫出 JSON 檔
+    production=False: 與原本相同的 indent=2 格式
+    production=True: minified，並產生 .gz / .br（compress=False 時只 minify）
+    返回：大小紀錄（給 print_size_report 使用），非 production 時返回 None
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if not production:
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **PRETTY)
+        os.replace(tmp_path, path)
+        remove_compressed(path)
+        return None
+
+    pretty_size = len(json.dumps(data, **PRETTY).encode('utf-8'))
+    _replace_bytes(path, json.dumps(data, **MINIFIED).encode('utf-8'))
+    return size_record(path, pretty_size, compress)
+
+
+def size_record(path, pretty_size, compress=True):
+    """已寫好的 minified 檔案 → 大小紀錄（compress 時同時產生壓縮檔）"""
+    path = Path(path)
+    record = {'path': str(path), 'pretty': pretty_size, 'minified': path.stat().st_size, '.gz': None, '.br': None}
+    if compress:
+        record.update(compress_file(path))
+    else:
+        remove_compressed(path)
+    return record
+
+
+def sum_records(label, records):
+    """多個檔案的大小紀錄加總為一筆"""
+    total = {'path': label}
+    for key in ('pretty', 'minified', '.gz', '.br'):
+        values = [r[key] for r in records]
+        total[key] = sum(values) if all(v is not None for v in values) else None
+    return total
+
+
+def print_size_report(records):
+    """列出各檔案 indent=2 → minified → .gz / .br 的大小"""
+    records = [r for r in records if r]
+    if not records:
+        return
+
+    def kb(n):
+        return f"{n / 1024:.1f}" if n is not None else '-'
+
+    print(f"\n{'檔案':<44}{'indent=2':>12}{'minified':>12}{'.gz':>10}{'.br':>10}  (KB)")
+    for r in records:
+        print(f"{r['path']:<44}{kb(r['pretty']):>12}{kb(r['minified']):>12}{kb(r['.gz']):>10}{kb(r['.br']):>10}")
+
+    if len(records) > 1:
+        total = {key: sum(r[key] for r in records if r[key] is not None) for key in ('pretty', 'minified', '.gz')}
+        total_br = sum(r['.br'] for r in records if r['.br'] is not None) if all(r['.br'] is not None for r in records) else None
+        print(f"{'合計':<44}{kb(total['pretty']):>12}{kb(total['minified']):>12}{kb(total['.gz']):>10}{kb(total_br):>10}")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python scripts/json_artifacts.py <檔案.json> [...]")
+        sys.exit(1)
+
+    records = []
+    for file_path in sys.argv[1:]:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        records.append(write_json(file_path, data, production=True))
+
+    print_size_report(records)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,95 +4,593 @@
 OCR 識別圖片上的章節號
 從每張圖片的上方（左上角、右上角）識別章節號（如 2:32）
 生成精確的頁碼-章節對應表
+
+每頁依 OCR_TIERS 分層識別：先以不放大的頁首快速識別，章節號信心不足時
+才放大、改用其他 --psm 或改讀另一側的頁首；各層確定的頁數在結束時列出，
+每頁採用的層與信心記錄在 OCR 紀錄（data/page-ocr-journal.jsonl）中
 """
 
 import re
+import os
 import json
+import hashlib
+import argparse
+import tempfile
+import time
 from pathlib import Path
+from itertools import islice
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from PIL import Image
 import pytesseract
 from book_info import get_book_by_page, ALL_BOOKS
+from json_artifacts import write_json, print_size_report
+from page_index import build_page_index
+from roi_loader import load_region
 
 # 如果 Windows 系統，需要指定 tesseract 路徑
 # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
-def extract_chapter_verse_from_image(image_path: str, page_num: int) -> tuple:
+# OCR 參數：任何一項改變，OCR 快取中的結果都會失效（見 OcrCache）
+# 1. 調整裁切框 (請先確認這個座標是否真的對準了左上角)
+# 如果是左上角，座標通常應該接近 (100, 100, 800, 400) 之類
+# 原本的 (400, 600...) 在大圖中可能已經跑到中間去了
+# 建議你先執行一次看 debug_crop.png
+CROP_BOX = (400, 600, 1100, 1000)
+# 閾值設為 150，小於 150 變黑(文字)，大於變白(背景)
+THRESHOLD = 150
+# Tesseract 在大字體上表現更好，放大 2-3 倍
+SCALE = 3
+# 前處理方式的識別碼（改變前處理演算法時更新，使快取失效）
+PREPROCESS = 'numpy-nearest'
+# --psm 6: 假設是一個統一的文本塊 (比 psm 7 對空格容忍度更好)
+# 移除 whitelist: 讓 Tesseract 識別所有字符，我們再用 Python 過濾
+TESSERACT_CONFIG = '--psm 6'
+
+# OCR 分層（cascade）：每頁先走最便宜的一層，章節號的信心不足時才升級到下一層
+# (名稱, 裁切位置, 放大倍數, Tesseract 參數)
+#   裁切位置 primary 為 CROP_BOX，opposite 為頁面另一側左右對稱的位置
+OCR_TIERS = (
+    ('fast', 'primary', 1, TESSERACT_CONFIG),     # 不放大，像素只有 1/9
+    ('upscale', 'primary', SCALE, TESSERACT_CONFIG),
+    ('psm7', 'primary', SCALE, '--psm 7'),         # 單行
+    ('psm11', 'primary', SCALE, '--psm 11'),       # 零散文字
+    ('corner', 'opposite', SCALE, TESSERACT_CONFIG),
+)
+# 章節號各字的 Tesseract 信心（0-100）最低值達到此值即採用，不再升級
+# 所有層都未達到時，採用信心最高的結果
+MIN_CONFIDENCE = 70
+
+# 【關鍵步驟 5】更強大的 Regex
+# 允許冒號前後有空格 (\s*)
+# 允許數字中間可能有誤判的雜訊
+CHAPTER_VERSE_RE = re.compile(r'(\d+)\s*[:;]\s*(\d+)')
+# 簡單的邏輯檢核：章節不可能超過 150 (詩篇) 或 176 (節) 太誇張的數字
+MAX_CHAPTER = 150
+MAX_VERSE = 200
+
+# 每次交給 Tesseract 的頁數（多頁 TIF），Tesseract 程序的啟動成本由整批分攤
+DEFAULT_BATCH_SIZE = 16
+
+DEFAULT_OCR_CACHE_FILE = 'data/ocr-cache.json'
+OCR_CACHE_VERSION = 2
+
+DEFAULT_OCR_JOURNAL_FILE = 'data/page-ocr-journal.jsonl'
+OCR_JOURNAL_VERSION = 1
+DEFAULT_OCR_RESULTS_FILE = 'data/page-ocr-results.json'
+
+_tesseract_version = None
+
+
+def get_tesseract_version() -> str:
+    """Tesseract 版本（每個程序只查詢一次）"""
+    global _tesseract_version
+    if _tesseract_version is None:
+        _tesseract_version = str(pytesseract.get_tesseract_version())
+    return _tesseract_version
+
+
+OcrResult = namedtuple('OcrResult', ['chapter', 'verse', 'tier', 'confidence'])
+OcrResult.__doc__ = """一頁的識別結果；識別失敗時 chapter、verse、tier 為 None"""
+
+FAILED = OcrResult(None, None, None, None)
+
+
+def preprocess_header(cropped: Image.Image, scale: int = SCALE) -> Image.Image:
+    """
+    頁首區域的前處理（以 NumPy 陣列一次處理整塊）
+    返回：放大 scale 倍的黑白（mode '1'）影像
+    """
+    # 【關鍵步驟 1】轉換為灰階
+    pixels = np.asarray(cropped.convert('L'))
+
+    # 【關鍵步驟 2】二值化處理 (去除淺色雜訊)
+    binary = pixels > THRESHOLD
+
+    # 【關鍵步驟 3】放大圖片 (Upscaling)
+    # 每個像素複製成 scale x scale，黑白影像放大後仍是黑白，可用 1 bit 儲存
+    if scale > 1:
+        binary = binary.repeat(scale, axis=0).repeat(scale, axis=1)
+
+    return Image.fromarray(binary)
+
+
+def header_box(image_path: str, corner: str = 'primary') -> tuple:
+    """頁首裁切框；opposite 為 CROP_BOX 以頁面中線左右對稱的位置"""
+    if corner == 'primary':
+        return CROP_BOX
+    with Image.open(image_path) as img:
+        width = img.width
+    left, top, right, bottom = CROP_BOX
+    return (width - right, top, width - left, bottom)
+
+
+def read_header_image(image_path: str, tier: tuple = OCR_TIERS[1]) -> Image.Image:
+    """依 OCR 層的設定裁切頁首並前處理，返回要交給 Tesseract 的影像"""
+    name, corner, scale, config = tier
+    # 只解碼頁首區域，不載入整張圖片（見 roi_loader.py）；不放大的層允許 JPEG 以 draft 模式解碼
+    cropped, _ = load_region(image_path, header_box(image_path, corner), draft=(scale == 1))
+
+    # 【DEBUG】檢查存在目錄下的圖片長怎樣
+    # preprocess_header(cropped, scale).save(f"debug_crop.png")
+
+    return preprocess_header(cropped, scale)
+
+
+def _split_words(data: dict, page_count: int) -> list:
+    """
+    image_to_data 的結果 → 各頁的字 [[(行 key, 字, 信心), ...], ...]
+    返回 None 表示頁數對不上
+    """
+    pages = [[] for _ in range(page_count)]
+    seen_pages = set()
+    for i, text in enumerate(data['text']):
+        page = data['page_num'][i] - 1
+        if not 0 <= page < page_count:
+            return None
+        seen_pages.add(page)
+        word = text.strip()
+        conf = float(data['conf'][i])
+        if word and conf >= 0:
+            line = f"{data['block_num'][i]}.{data['par_num'][i]}.{data['line_num'][i]}"
+            pages[page].append((line, word, conf))
+    return pages if len(seen_pages) == page_count else None
+
+
+def ocr_images(images: list, config: str = TESSERACT_CONFIG) -> list:
+    """
+    以 Tesseract 識別多張影像，返回各影像的字與信心 [[(行 key, 字, 信心), ...], ...]
+    多張時存成一個多頁 TIF 一次交給 Tesseract，只啟動一次程序；
+    image_to_data 的 page_num 欄位標示每個字所在的頁
+    """
+    # 【關鍵步驟 4】調整 Tesseract 參數
+    def to_data(image):
+        return pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+
+    if len(images) == 1:
+        return _split_words(to_data(images[0]), 1) or [[]]
+
+    with tempfile.TemporaryDirectory(prefix='hinghua-ocr-') as tmp_dir:
+        batch_file = Path(tmp_dir) / 'batch.tif'
+        images[0].save(batch_file, save_all=True, append_images=images[1:])
+        pages = _split_words(to_data(str(batch_file)), len(images))
+
+    if pages is None:
+        # 頁數對不上時無法判斷哪些字屬於哪一頁，改為逐頁識別
+        return [(_split_words(to_data(image), 1) or [[]])[0] for image in images]
+    return pages
+
+
+def _match_chapter_verse(text: str):
+    """在文字中找出合理的章節號，返回 re.Match 或 None"""
+    match = CHAPTER_VERSE_RE.search(text)
+
+    if match:
+        chapter = int(match.group(1))
+        verse = int(match.group(2))
+
+        if 0 < chapter <= MAX_CHAPTER and 0 < verse <= MAX_VERSE:
+            return match
+
+    # 如果第一次失敗，嘗試針對 "Underdots" 的修補
+    # 很多時候 '2' 會被辨識成非數字字符，這裡可以做 fallback 處理
+    # 但通常放大圖片 + 移除 whitelist 就能解決 90%
+    return None
+
+
+def parse_chapter_verse(text: str) -> tuple:
+    """從 OCR 文字中找出章節號，返回 (章, 節) 或 (None, None)"""
+    match = _match_chapter_verse(text)
+    if match is None:
+        return None, None
+    return int(match.group(1)), int(match.group(2))
+
+
+def parse_ocr_words(words: list) -> tuple:
+    """
+    [(行 key, 字, 信心), ...] → (章, 節, 信心)
+    信心為組成章節號的各字信心的最低值；找不到章節號時返回 (None, None, None)
+    """
+    parts = []
+    spans = []  # [(起點, 終點, 信心), ...]
+    pos = 0
+    prev_line = None
+    for line, word, conf in words:
+        if parts:
+            parts.append(' ' if line == prev_line else '\n')
+            pos += 1
+        spans.append((pos, pos + len(word), conf))
+        parts.append(word)
+        pos += len(word)
+        prev_line = line
+
+    match = _match_chapter_verse(''.join(parts))
+    if match is None:
+        return None, None, None
+
+    start, end = match.span()
+    confidence = min(conf for word_start, word_end, conf in spans if word_start < end and start < word_end)
+    return int(match.group(1)), int(match.group(2)), confidence
+
+
+def tier_key(tier: tuple) -> str:
+    """OCR 層在快取中的識別碼（名稱以外的設定）"""
+    name, corner, scale, config = tier
+    return f"{corner}/{scale}/{config}"
+
+
+class OcrCache:
+    """
+    OCR 結果的磁碟快取（以內容定址）
+    key 為 (圖片內容雜湊, CROP_BOX, THRESHOLD, PREPROCESS, Tesseract 版本) 的雜湊
+    value 為各 OCR 層的 Tesseract 輸出 {tier_key: [[行 key, 字, 信心], ...]}：
+    - 圖片或前處理參數改變的頁面才需要重新 OCR；新增的層只對需要它的頁面執行
+    - 章節號的解析與 MIN_CONFIDENCE 的判斷每次都從快取的輸出重新計算，
+      改 regex 或門檻時完全不呼叫 Tesseract
+    """
+
+    def __init__(self, path=DEFAULT_OCR_CACHE_FILE, entries=None):
+        """entries 不為 None 時直接使用（平行 OCR 的子程序），不讀取檔案"""
+        self.path = Path(path) if path is not None else None
+        self.entries = entries if entries is not None else {}
+        self.updates = {}  # 本次新增的項目
+        self.hits = 0
+        self.misses = 0
+        self._params = None
+
+        if entries is None and self.path is not None and self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == OCR_CACHE_VERSION:
+                    self.entries = data.get('entries', {})
+            except (OSError, ValueError) as e:
+                print(f"  警告: 無法讀取 OCR 快取 {self.path}: {e}")
+
+    def make_key(self, image_path: str) -> str:
+        if self._params is None:
+            self._params = json.dumps([CROP_BOX, THRESHOLD, PREPROCESS, get_tesseract_version()])
+        h = hashlib.blake2b(digest_size=16)
+        with open(image_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        h.update(b'\0' + self._params.encode('utf-8'))
+        return h.hexdigest()
+
+    def lookup(self, key: str) -> dict:
+        """返回快取中這張圖片各層輸出的複本 {tier_key: 字串列}，沒有時為空 dict"""
+        return dict(self.entries.get(key, {}))
+
+    def store(self, key: str, tier: tuple, words: list):
+        """記錄一層的 Tesseract 輸出"""
+        entry = self.entries.setdefault(key, {})
+        entry[tier_key(tier)] = [list(word) for word in words]
+        self.updates[key] = entry
+
+    def count(self, ran_tesseract: bool):
+        """統計一頁：是否需要執行 Tesseract"""
+        if ran_tesseract:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def merge(self, updates, hits, misses):
+        """併入子程序的新項目與統計"""
+        for key, tiers in updates.items():
+            self.entries.setdefault(key, {}).update(tiers)
+            self.updates[key] = self.entries[key]
+        self.hits += hits
+        self.misses += misses
+
+    def save(self):
+        """寫回快取檔（先寫暫存檔再改名）；保留所有項目，參數改回舊值時仍可使用"""
+        if self.path is None or not self.updates:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': OCR_CACHE_VERSION, 'entries': self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def report(self):
+        total = self.hits + self.misses
+        print(f"  OCR 快取: 命中 {self.hits} / {total} 頁，執行 Tesseract {self.misses} 頁")
+
+
+class OcrJournal:
+    """
+    逐頁寫入的 OCR 紀錄（JSONL，只附加不改寫），中途中斷時已完成的頁面不會遺失
+    第一行為檔頭 {"version", "image_dir"}，
+    之後每行一頁：{"page": 頁碼, "chapter": 章, "verse": 節, "tier": 採用的 OCR 層, "confidence": 信心}
+    記錄的是 OCR 的原始結果；失敗頁面沿用前一頁的推測在 build_page_mapping() 中才處理
+    """
+
+    def __init__(self, path=DEFAULT_OCR_JOURNAL_FILE):
+        self.path = Path(path)
+        self._file = None
+
+    def load(self, image_dir: str) -> dict:
+        """
+        讀取已記錄的頁面，返回 {頁碼: OcrResult}
+        檔頭與 image_dir 不符時返回空的結果；最後一行寫到一半（程序中斷）時略過該行
+        """
+        results = {}
+        if not self.path.exists():
+            return results
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        if not lines:
+            return results
+
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            header = {}
+        if header.get('version') != OCR_JOURNAL_VERSION or header.get('image_dir') != image_dir:
+            print(f"  警告: OCR 紀錄 {self.path} 不是這個圖片目錄的紀錄，全部重新識別")
+            return results
+
+        for line_num, line in enumerate(lines[1:], 2):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                if line_num == len(lines):
+                    break
+                raise ValueError(f"{self.path} 第 {line_num} 行格式錯誤")
+            results[entry['page']] = OcrResult(entry['chapter'], entry['verse'], entry.get('tier'),
+                                               entry.get('confidence'))
+        return results
+
+    def open(self, image_dir: str, resume: bool = False):
+        """開始寫入；resume 時接在原本的紀錄後面，否則清空重寫"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if resume and self.path.exists() and self.path.stat().st_size > 0:
+            # 去掉中斷時寫到一半的最後一行，新的紀錄才不會接在它後面
+            with open(self.path, 'rb+') as f:
+                data = f.read()
+                if not data.endswith(b'\n'):
+                    f.truncate(data.rfind(b'\n') + 1)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            return
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write({'version': OCR_JOURNAL_VERSION, 'image_dir': image_dir})
+
+    def append(self, page_num: int, result: OcrResult):
+        self._write({'page': page_num, **result._asdict()})
+
+    def _write(self, record):
+        # 每行寫完立即 flush，程序中斷時最多遺失正在寫的一行
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def extract_chapter_verses(image_paths: list, cache: OcrCache = None, tier_stats: dict = None) -> list:
+    """
+    以 OCR_TIERS 逐層識別多張圖片的章節號
+    每一層把尚未確定的頁面一起交給 Tesseract（快取中已有該層輸出的頁面不必重跑），
+    信心達到 MIN_CONFIDENCE 的頁面即確定，其餘升級到下一層
+    tier_stats: 不為 None 時累計各層的 Tesseract 頁數與秒數 {層名稱: [頁數, 秒數]}
+    返回：[OcrResult, ...]，與 image_paths 順序相同
+    """
+    results = [FAILED] * len(image_paths)
+    best = [FAILED] * len(image_paths)  # 尚未達到門檻時，目前信心最高的結果
+    entries = {}  # {索引: {tier_key: 字串列}}
+    keys = {}
+    ran_tesseract = set()
+    failed = set()  # Tesseract 執行失敗的頁面：本次視為識別失敗，不寫入快取
+
+    for i, image_path in enumerate(image_paths):
+        try:
+            keys[i] = cache.make_key(image_path) if cache is not None else None
+            entries[i] = cache.lookup(keys[i]) if cache is not None else {}
+        except Exception as e:
+            print(f"  [!] 識別錯誤 {image_path}: {e}")
+
+    remaining = list(entries)
+    for tier in OCR_TIERS:
+        if not remaining:
+            break
+        name = tier[0]
+        key = tier_key(tier)
+
+        pending = []  # [(索引, 前處理後的影像), ...]
+        for i in remaining:
+            if key not in entries[i]:
+                try:
+                    pending.append((i, read_header_image(image_paths[i], tier)))
+                except Exception as e:
+                    print(f"  [!] 識別錯誤 {image_paths[i]}: {e}")
+        if pending:
+            start = time.perf_counter()
+            try:
+                pages = ocr_images([image for _, image in pending], tier[3])
+            except Exception as e:
+                print(f"  [!] Tesseract 錯誤: {e}")
+                failed.update(i for i, _ in pending)
+                pages = []
+            if tier_stats is not None:
+                stats = tier_stats.setdefault(name, [0, 0.0])
+                stats[0] += len(pending)
+                stats[1] += time.perf_counter() - start
+            for (i, _), words in zip(pending, pages):
+                entries[i][key] = words
+                ran_tesseract.add(i)
+                if cache is not None:
+                    cache.store(keys[i], tier, words)
+
+        still_remaining = []
+        for i in remaining:
+            if i in failed:
+                continue
+            chapter, verse, confidence = parse_ocr_words(entries[i].get(key, []))
+            if chapter is not None and confidence >= MIN_CONFIDENCE:
+                results[i] = OcrResult(chapter, verse, name, confidence)
+                continue
+            if chapter is not None and (best[i].confidence is None or confidence > best[i].confidence):
+                best[i] = OcrResult(chapter, verse, name, confidence)
+            still_remaining.append(i)
+        remaining = still_remaining
+
+    # 每一層都未達到門檻：採用信心最高的結果（沒有任何一層找到章節號時為識別失敗）
+    for i in remaining:
+        results[i] = best[i]
+
+    if cache is not None:
+        for i in entries:
+            cache.count(i in ran_tesseract or i in failed)
+
+    return results
+
+
+def extract_chapter_verse_from_image(image_path: str, page_num: int, cache: OcrCache = None) -> tuple:
     """
     改進版：從圖片中提取章節號
+    cache: OcrCache，None 表示每頁都重新 OCR
+    """
+    result = extract_chapter_verses([image_path], cache)[0]
+    return result.chapter, result.verse
+
+
+def report_tiers(results: list, tier_stats: dict = None):
+    """
+    列出各 OCR 層確定的頁數
+    results: [OcrResult, ...]；tier_stats: extract_chapter_verses 累計的 Tesseract 頁數與秒數
     """
+    resolved = {}
+    low_confidence = {}
+    for result in results:
+        if result.tier is None:
+            continue
+        counts = resolved if result.confidence is None or result.confidence >= MIN_CONFIDENCE else low_confidence
+        counts[result.tier] = counts.get(result.tier, 0) + 1
+    failed = sum(1 for result in results if result.tier is None)
+
+    total = len(results) or 1
+    print(f"\n{'OCR 層':<12}{'確定頁數':>10}{'佔比':>8}{'低信心採用':>12}{'Tesseract 頁數':>16}{'秒數':>10}")
+    for name, *_ in OCR_TIERS:
+        ocr_pages, seconds = (tier_stats or {}).get(name, (0, 0.0))
+        print(f"{name:<12}{resolved.get(name, 0):>10}{resolved.get(name, 0) / total:>8.1%}"
+              f"{low_confidence.get(name, 0):>12}{ocr_pages:>16}{seconds:>10.1f}")
+    print(f"{'失敗':<12}{failed:>10}{failed / total:>8.1%}")
+
+
+# 平行 OCR：子程序內的快取內容（由 _init_worker 設定）
+_worker_cache_entries = None
+
+
+def _init_worker(cache_entries):
+    global _worker_cache_entries
+    _worker_cache_entries = cache_entries
+
+
+def _ocr_batch(tasks: list, cache: OcrCache = None, tier_stats: dict = None) -> tuple:
+    """
+    [(圖片路徑, 頁碼), ...] → ([(頁碼, OcrResult), ...], 新快取項目, 命中數, 未命中數, 各層統計)
+    平行模式下在子程序中執行，使用 _init_worker 設定的快取內容
+    """
+    worker_cache = cache
+    if worker_cache is None and _worker_cache_entries is not None:
+        worker_cache = OcrCache(path=None, entries=_worker_cache_entries)
+    if tier_stats is None:
+        tier_stats = {}
+
+    results = extract_chapter_verses([image_path for image_path, _ in tasks], worker_cache, tier_stats)
+    pages = [(page_num, result) for (_, page_num), result in zip(tasks, results)]
+
+    if cache is None and worker_cache is not None:
+        return pages, worker_cache.updates, worker_cache.hits, worker_cache.misses, tier_stats
+    return pages, {}, 0, 0, tier_stats
+
+
+def iter_ocr_results(tasks, workers: int = 1, cache: OcrCache = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                     tier_stats: dict = None):
+    """
+    依 tasks 的順序逐頁返回 (頁碼, OcrResult)
+
+    Args:
+        tasks: [(圖片路徑, 頁碼), ...]
+        workers: 大於 1 時以 process pool 平行識別，同時送出的批次最多 workers * 2 個
+        cache: OcrCache；平行模式下子程序的新項目會併回這個快取
+        batch_size: 每次交給 Tesseract 的頁數
+        tier_stats: 累計各 OCR 層的 Tesseract 頁數與秒數（見 extract_chapter_verses）
+    """
+    if tier_stats is None:
+        tier_stats = {}
+    tasks = iter(tasks)
+    batches = iter(lambda: list(islice(tasks, batch_size)), [])
+
+    if workers <= 1:
+        for batch in batches:
+            yield from _ocr_batch(batch, cache, tier_stats)[0]
+        return
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(cache.entries if cache is not None else None,)
+    )
     try:
-        img = Image.open(image_path)
-        
-        # 1. 調整裁切框 (請先確認這個座標是否真的對準了左上角)
-        # 如果是左上角，座標通常應該接近 (100, 100, 800, 400) 之類
-        # 原本的 (400, 600...) 在大圖中可能已經跑到中間去了
-        # 建議你先執行一次看 debug_crop.png
-        crop_box = (400, 600, 1100, 1000) 
-        cropped = img.crop(crop_box)
-
-        # 【關鍵步驟 1】轉換為灰階
-        cropped = cropped.convert('L')
-
-        # 【關鍵步驟 2】二值化處理 (去除淺色雜訊)
-        # 閾值設為 150，小於 150 變黑(文字)，大於變白(背景)
-        threshold = 150
-        cropped = cropped.point(lambda p: p > threshold and 255) 
-
-        # 【關鍵步驟 3】放大圖片 (Upscaling)
-        # Tesseract 在大字體上表現更好，放大 2-3 倍
-        new_size = (cropped.width * 3, cropped.height * 3)
-        cropped = cropped.resize(new_size, Image.Resampling.LANCZOS)
-        
-        # 【DEBUG】檢查存在目錄下的圖片長怎樣
-        # cropped.save(f"debug_crop_{page_num}.png")
-
-        # 【關鍵步驟 4】調整 Tesseract 參數
-        # --psm 6: 假設是一個統一的文本塊 (比 psm 7 對空格容忍度更好)
-        # 移除 whitelist: 讓 Tesseract 識別所有字符，我們再用 Python 過濾
-        text = pytesseract.image_to_string(
-            cropped,
-            config='--psm 6' 
-        )
-
-        # 【關鍵步驟 5】更強大的 Regex
-        # 允許冒號前後有空格 (\s*)
-        # 允許數字中間可能有誤判的雜訊
-        match = re.search(r'(\d+)\s*[:;]\s*(\d+)', text)
-        
-        if match:
-            chapter = int(match.group(1))
-            verse = int(match.group(2))
-            
-            # 簡單的邏輯檢核：章節不可能超過 150 (詩篇) 或 176 (節) 太誇張的數字
-            if 0 < chapter <= 150 and 0 < verse <= 200:
-                return chapter, verse
-        
-        # 如果第一次失敗，嘗試針對 "Underdots" 的修補
-        # 很多時候 '2' 會被辨識成非數字字符，這裡可以做 fallback 處理
-        # 但通常放大圖片 + 移除 whitelist 就能解決 90%
-
-        # print(f"  [Debug] Raw text for page {page_num}: {text.strip()}") # 除錯看原始文字
-
-    except Exception as e:
-        print(f"  [!] 識別錯誤 {image_path}: {e}")
-
-    return None, None
-
-
-def scan_all_images(image_dir: str, renamed: bool = False) -> dict:
+        pending = deque(executor.submit(_ocr_batch, batch) for batch in islice(batches, workers * 2))
+        while pending:
+            # 依送出順序取結果，先完成的批次會等前面的批次
+            pages, updates, hits, misses, batch_stats = pending.popleft().result()
+            if cache is not None:
+                cache.merge(updates, hits, misses)
+            for name, (count, seconds) in batch_stats.items():
+                stats = tier_stats.setdefault(name, [0, 0.0])
+                stats[0] += count
+                stats[1] += seconds
+            for batch in islice(batches, 1):
+                pending.append(executor.submit(_ocr_batch, batch))
+            yield from pages
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def scan_all_images(image_dir: str, renamed: bool = False, workers: int = 1, cache: OcrCache = None,
+                    batch_size: int = DEFAULT_BATCH_SIZE, journal: OcrJournal = None,
+                    resume: bool = False) -> dict:
     """
     掃描所有圖片，識別章節號
 
     Args:
         image_dir: 圖片目錄
         renamed: 是否已重命名為流水號
+        workers: 平行 OCR 的程序數（1 表示逐頁執行）；結果依頁碼順序處理，與逐頁執行相同
+        cache: OcrCache，None 表示每頁都重新 OCR
+        batch_size: 每次交給 Tesseract 的頁數
+        journal: OcrJournal，每頁識別完成即寫入；None 表示不記錄
+        resume: 略過 journal 中已記錄的頁面（接續中斷的執行）
 
     Returns:
-        {
-            '0001': {'chapter': 1, 'verse': 1, 'book': ...},
-            '0002': {'chapter': 1, 'verse': 15, 'book': ...},
-            ...
-        }
+        build_page_mapping() 的結果
     """
     image_path = Path(image_dir)
 
@@ -105,58 +603,121 @@ def scan_all_images(image_dir: str, renamed: bool = False) -> dict:
         image_files = natsorted(list(image_path.glob('*.tif')))
 
     print(f"找到 {len(image_files)} 張圖片")
-    print("開始 OCR 識別...")
 
-    page_mapping = {}
+    # 頁碼（從檔名獲取，或使用序號）
+    tasks = [(str(img_file), int(img_file.stem) if renamed else i)
+             for i, img_file in enumerate(image_files, 1)]
 
-    for i, img_file in enumerate(image_files, 1):
-        # 頁碼（從檔名獲取，或使用序號）
-        if renamed:
-            page_num = int(img_file.stem)
-        else:
-            page_num = i
+    ocr_results = journal.load(image_dir) if journal is not None and resume else {}
+    if ocr_results:
+        tasks = [task for task in tasks if task[1] not in ocr_results]
+        print(f"接續上次的紀錄：已完成 {len(ocr_results)} 頁，剩餘 {len(tasks)} 頁")
+
+    print(f"開始 OCR 識別...（{workers} 個程序）" if workers > 1 else "開始 OCR 識別...")
+
+    if journal is not None:
+        journal.open(image_dir, resume=bool(ocr_results))
+    run_results = []  # 本次識別的結果（各層統計用）
+    tier_stats = {}
+    try:
+        for i, (page_num, result) in enumerate(iter_ocr_results(tasks, workers, cache, batch_size, tier_stats), 1):
+            if journal is not None:
+                journal.append(page_num, result)
+            ocr_results[page_num] = result
+            run_results.append(result)
+
+            book_info = get_book_by_page(page_num)
+            if result.chapter and result.verse and book_info:
+                print(f"  進度: {i}/{len(tasks)} - {book_info[1]} {result.chapter}:{result.verse}"
+                      f"（{result.tier}，信心 {result.confidence:.0f}）")
+            elif i % 50 == 0:
+                print(f"  進度: {i}/{len(tasks)} - 識別失敗")
+    finally:
+        if journal is not None:
+            journal.close()
+        report_tiers(run_results, tier_stats)
+
+    page_mapping = build_page_mapping(ocr_results)
+
+    print(f"\n[OK] OCR 完成！成功識別 {len([p for p in page_mapping.values() if 'ocr_failed' not in p])} 頁")
+
+    return page_mapping
 
-        # OCR 識別
-        chapter, verse = extract_chapter_verse_from_image(str(img_file), page_num)
 
+def build_page_mapping(ocr_results: dict) -> dict:
+    """
+    OCR 原始結果 {頁碼: OcrResult} → 頁碼對應表（page-ocr-results.json 的內容）
+    {
+        '0001': {'chapter': 1, 'verse': 1, 'book': ...},
+        '0002': {'chapter': 1, 'verse': 15, 'book': ...},
+        ...
+    }
+    識別失敗的頁面沿用前一頁的章與書卷，verse 為 None 並標記 ocr_failed
+    """
+    page_mapping = {}
+    last_entry = None  # 前一頁的結果，失敗頁面由此推測
+
+    # 失敗頁面沿用前一頁的推測必須依頁碼順序處理
+    for page_num in sorted(ocr_results):
+        chapter, verse = ocr_results[page_num][:2]
         # 獲取書卷資訊
         book_info = get_book_by_page(page_num)
 
         if chapter and verse and book_info:
-            page_mapping[f"{page_num:04d}"] = {
+            last_entry = page_mapping[f"{page_num:04d}"] = {
                 'chapter': chapter,
                 'verse': verse,
                 'book_rom': book_info[0],
                 'book_han': book_info[1],
                 'book_english': book_info[2]
             }
-
-            if i % 1 == 0:
-                print(f"  進度: {i}/{len(image_files)} - {book_info[1]} {chapter}:{verse}")
-        else:
+        elif last_entry is not None:
             # 識別失敗，使用前一頁的資訊推測
-            if page_mapping:
-                last_page = list(page_mapping.values())[-1]
-                page_mapping[f"{page_num:04d}"] = {
-                    'chapter': last_page['chapter'],
-                    'verse': None,  # 無法確定
-                    'book_rom': last_page['book_rom'],
-                    'book_han': last_page['book_han'],
-                    'book_english': last_page['book_english'],
-                    'ocr_failed': True
-                }
+            last_entry = page_mapping[f"{page_num:04d}"] = {
+                'chapter': last_entry['chapter'],
+                'verse': None,  # 無法確定
+                'book_rom': last_entry['book_rom'],
+                'book_han': last_entry['book_han'],
+                'book_english': last_entry['book_english'],
+                'ocr_failed': True
+            }
 
-            if i % 50 == 0:
-                print(f"  進度: {i}/{len(image_files)} - 識別失敗")
+    return page_mapping
 
-    print(f"\n[OK] OCR 完成！成功識別 {len([p for p in page_mapping.values() if 'ocr_failed' not in p])} 頁")
 
+def compact_journal(journal: OcrJournal, image_dir: str, output_file: str = DEFAULT_OCR_RESULTS_FILE,
+                    production: bool = False) -> dict:
+    """
+    由 OCR 紀錄產生最終的 page-ocr-results.json，返回頁碼對應表
+    紀錄是空的、或頁數少於圖片目錄（沒有圖片目錄時為現有 output_file）的頁數時
+    拋出 ValueError，不會以不完整的結果覆蓋現有的輸出
+    """
+    ocr_results = journal.load(image_dir)
+
+    # 應有的頁數：圖片目錄的頁數，沒有圖片目錄時以現有的輸出為準
+    if Path(image_dir).is_dir():
+        expected_pages, source = len(list(Path(image_dir).glob('*.tif'))), image_dir
+    elif Path(output_file).exists():
+        with open(output_file, 'r', encoding='utf-8') as f:
+            expected_pages, source = len(json.load(f)), output_file
+    else:
+        expected_pages, source = 0, None
+    if not ocr_results or len(ocr_results) < expected_pages:
+        raise ValueError(f"OCR 紀錄 {journal.path} 只有 {len(ocr_results)} 頁"
+                         + (f"，少於 {source} 的 {expected_pages} 頁" if source else "")
+                         + f"，未覆寫 {output_file}")
+
+    page_mapping = build_page_mapping(ocr_results)
+    print_size_report([write_json(output_file, page_mapping, production=production)])
+    print(f"\n[OK] 已保存 OCR 原始結果：{output_file}（{len(page_mapping)} 頁）")
     return page_mapping
 
 
-def generate_chapter_page_mapping(page_mapping: dict, output_file: str = 'data/chapter-page-mapping.json'):
+def generate_chapter_page_mapping(page_mapping: dict, output_file: str = 'data/chapter-page-mapping.json',
+                                  production: bool = False):
     """
     生成章節-頁碼對應表
+    production: 輸出 minified JSON 及 .gz / .br 預壓縮檔
 
     格式：
     {
@@ -229,8 +790,7 @@ def generate_chapter_page_mapping(page_mapping: dict, output_file: str = 'data/c
         }
 
     # 輸出 JSON
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(chapter_mapping, f, ensure_ascii=False, indent=2)
+    print_size_report([write_json(output_file, chapter_mapping, production=production)])
 
     print(f"\n[OK] 已生成章節-頁碼對應表：{output_file}")
 
@@ -245,40 +805,74 @@ def generate_chapter_page_mapping(page_mapping: dict, output_file: str = 'data/c
 if __name__ == '__main__':
     import sys
 
+    parser = argparse.ArgumentParser(description='OCR 識別掃描頁上的章節號')
+    parser.add_argument('--workers', '-w', type=int, default=1, help='平行 OCR 的程序數（預設 1）')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'每次交給 Tesseract 的頁數（預設 {DEFAULT_BATCH_SIZE}）')
+    parser.add_argument('--cache-file', default=DEFAULT_OCR_CACHE_FILE, help='OCR 快取檔案')
+    parser.add_argument('--no-cache', action='store_true', help='不使用 OCR 快取，全部重新識別')
+    parser.add_argument('--journal-file', default=DEFAULT_OCR_JOURNAL_FILE, help='逐頁寫入的 OCR 紀錄（JSONL）')
+    parser.add_argument('--resume', action='store_true', help='接續上次中斷的執行，略過紀錄中已完成的頁面')
+    parser.add_argument('--compact-only', action='store_true',
+                        help='不執行 OCR，只由 OCR 紀錄重新產生 page-ocr-results.json 與對應表')
+    parser.add_argument('--production', action='store_true', help='輸出 minified JSON 及 .gz / .br 預壓縮檔')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("興化語聖經 - OCR 頁碼識別工具")
     print("=" * 60)
 
-    # 檢查 tesseract 是否安裝
-    try:
-        pytesseract.get_tesseract_version()
-        print("[OK] Tesseract OCR 已安裝")
-    except:
-        print("[ERROR] 錯誤：未找到 Tesseract OCR")
-        print("  請安裝 Tesseract：")
-        print("  - Windows: https://github.com/UB-Mannheim/tesseract/wiki")
-        print("  - macOS: brew install tesseract")
-        print("  - Linux: sudo apt-get install tesseract-ocr")
-        sys.exit(1)
+    production = args.production
+    journal = OcrJournal(args.journal_file)
 
     # 選擇圖片目錄
     if Path('pics').exists():
         image_dir = 'pics'
         renamed = True
         print(f"\n使用圖片目錄：{image_dir}")
+    elif args.compact_only:
+        image_dir = 'pics'
     else:
         print("[ERROR] 找不到 pics 目錄")
         sys.exit(1)
 
-    # 掃描圖片
-    page_mapping = scan_all_images(image_dir, renamed=renamed)
-
-    # 保存原始 OCR 結果
-    with open('data/page-ocr-results.json', 'w', encoding='utf-8') as f:
-        json.dump(page_mapping, f, ensure_ascii=False, indent=2)
-    print(f"\n[OK] 已保存 OCR 原始結果：data/page-ocr-results.json")
+    if not args.compact_only:
+        # 檢查 tesseract 是否安裝
+        try:
+            pytesseract.get_tesseract_version()
+            print("[OK] Tesseract OCR 已安裝")
+        except:
+            print("[ERROR] 錯誤：未找到 Tesseract OCR")
+            print("  請安裝 Tesseract：")
+            print("  - Windows: https://github.com/UB-Mannheim/tesseract/wiki")
+            print("  - macOS: brew install tesseract")
+            print("  - Linux: sudo apt-get install tesseract-ocr")
+            sys.exit(1)
+
+        # 掃描圖片（每頁完成即寫入 OCR 紀錄）
+        cache = None if args.no_cache else OcrCache(args.cache_file)
+        try:
+            scan_all_images(image_dir, renamed=renamed, workers=args.workers, cache=cache,
+                            batch_size=args.batch_size, journal=journal, resume=args.resume)
+        finally:
+            # 中斷時也保存已完成頁面的快取
+            if cache is not None:
+                cache.save()
+                cache.report()
+
+    # 由 OCR 紀錄產生 OCR 原始結果
+    try:
+        page_mapping = compact_journal(journal, image_dir, production=production)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        if args.compact_only:
+            print("  請先執行 OCR（可加 --resume 接續上次的紀錄）")
+        sys.exit(1)
 
     # 生成章節對應表
-    chapter_mapping = generate_chapter_page_mapping(page_mapping)
+    chapter_mapping = generate_chapter_page_mapping(page_mapping, production=production)
+
+    # 編譯網頁用的頁碼索引
+    build_page_index(production=production)
 
     print("\n[DONE] 完成！")
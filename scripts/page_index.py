@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+從 page-ocr-results.json 編譯經節 → 掃描頁的查詢索引（page-index.json）
+取代網頁原本載入的 chapter-page-mapping.json 與 page-ocr-results.json
+
+格式：
+{
+    "version": 1,
+    "books": [
+        {"name_han": "創世記", "name_eng": "Genesis", "page_start": 9, "page_end": 71,
+         "refs": [257, 282, 532, ...],      # chapter << 8 | verse，由小到大
+         "pages": [9, 10, 11, ...]},        # refs[i] 所在的頁碼
+        ...
+    ]
+}
+books 依 ALL_BOOKS 順序；頁碼為整數（檔名為 4 位數補零）
+查詢「第 X 卷 chapter:verse 在哪一頁」：在 refs 中二分搜尋最後一個 <= 目標的位置，
+取同位置的 pages；目標在第一筆之前時為 page_start
+
+每頁所屬書卷以 book_info 的起始頁判斷（不使用 OCR 結果中的書名）
+OCR 失敗（沒有節號）或章節比前一頁小（誤判）的頁面不列入
+
+用法: python scripts/page_index.py [--production]
+"""
+
+import sys
+import json
+import time
+import unicodedata
+from bisect import bisect_right
+from book_info import ALL_BOOKS, get_book_index
+from json_artifacts import write_json, print_size_report
+
+INDEX_VERSION = 1
+
+DEFAULT_OCR_FILE = 'data/page-ocr-results.json'
+DEFAULT_INDEX_FILE = 'data/page-index.json'
+WEBSITE_INDEX_FILE = 'website/public/page-index.json'
+
+
+def pack_ref(chapter, verse):
+    return (chapter << 8) | verse
+
+
+def compile_page_index(page_mapping: dict):
+    """
+    page-ocr-results.json 的內容 → (索引, 略過的頁面 [(頁碼, 原因), ...])
+    """
+    last_page = max((int(page) for page in page_mapping), default=0)
+
+    books = []
+    for i, (rom, han, eng, start_page) in enumerate(ALL_BOOKS):
+        next_start = ALL_BOOKS[i + 1][3] if i + 1 < len(ALL_BOOKS) else max(last_page, start_page) + 1
+        books.append({
+            "name_han": unicodedata.normalize('NFC', han),
+            "name_eng": eng,
+            "page_start": start_page,
+            "page_end": next_start - 1,
+            "refs": [],
+            "pages": [],
+        })
+
+    skipped = []
+    for page_str, info in sorted(page_mapping.items(), key=lambda item: int(item[0])):
+        page = int(page_str)
+        if info.get('ocr_failed') or not info.get('verse'):
+            skipped.append((page_str, 'OCR 失敗'))
+            continue
+
+        book_index = get_book_index(page)
+        if book_index is None:
+            skipped.append((page_str, '不在任何書卷範圍內'))
+            continue
+
+        book = books[book_index]
+        ref = pack_ref(info['chapter'], info['verse'])
+        if book['refs'] and ref < book['refs'][-1]:
+            skipped.append((page_str, f"{info['chapter']}:{info['verse']} 小於前一頁"))
+            continue
+
+        book['refs'].append(ref)
+        book['pages'].append(page)
+
+    return {"version": INDEX_VERSION, "books": books}, skipped
+
+
+class PageIndex:
+    """page-index.json 的查詢"""
+
+    def __init__(self, index: dict):
+        if index.get('version') != INDEX_VERSION:
+            raise ValueError(f"不支援的頁碼索引版本: {index.get('version')}")
+        self.books = {}
+        for book in index['books']:
+            self.books[book['name_han']] = book
+            self.books[book['name_eng']] = book
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def page_for(self, book_name, chapter=1, verse=1):
+        """
+        book_name: 漢字或英文書名
+        返回：包含 chapter:verse 的掃描頁（'0009' 形式），找不到書卷時返回 None
+        """
+        book = self.books.get(unicodedata.normalize('NFC', book_name))
+        if book is None:
+            return None
+        i = bisect_right(book['refs'], pack_ref(chapter, verse)) - 1
+        page = book['pages'][i] if i >= 0 else book['page_start']
+        return f"{page:04d}"
+
+
+def linear_page_for(page_mapping, book_han, chapter, verse=1):
+    """與 BibleReader.jsx 目前相同的逐頁掃描（比較用）"""
+    target_page = None
+    for page_num in sorted(page_mapping):
+        info = page_mapping[page_num]
+        if info['book_han'] != book_han:
+            continue
+        page_verse = info.get('verse') or 1
+        if (info['chapter'], page_verse) <= (chapter, verse):
+            target_page = page_num
+        elif info['chapter'] > chapter:
+            break
+    return target_page
+
+
+def build_page_index(ocr_file=DEFAULT_OCR_FILE, output_files=(DEFAULT_INDEX_FILE, WEBSITE_INDEX_FILE),
+                     production=False):
+    """讀取 OCR 結果，寫出 page-index.json；返回索引"""
+    with open(ocr_file, 'r', encoding='utf-8') as f:
+        page_mapping = json.load(f)
+
+    index, skipped = compile_page_index(page_mapping)
+
+    records = [write_json(path, index, production=production) for path in output_files]
+    print_size_report(records)
+
+    print(f"\n[OK] 已寫入頁碼索引：{', '.join(output_files)}")
+    print(f"  收錄 {sum(len(book['refs']) for book in index['books'])} 頁，略過 {len(skipped)} 頁")
+    for page, reason in skipped:
+        print(f"    {page}: {reason}")
+
+    return index
+
+
+def main():
+    production = '--production' in sys.argv[1:]
+    index = build_page_index(production=production)
+
+    with open(DEFAULT_OCR_FILE, 'r', encoding='utf-8') as f:
+        page_mapping = json.load(f)
+
+    # 每卷每章第 1 節各查一次，比較逐頁掃描與二分搜尋
+    queries = [(book['name_han'], ref >> 8) for book in index['books'] for ref in book['refs'] if ref & 0xff == 1]
+    page_index = PageIndex(index)
+
+    start = time.perf_counter()
+    for book_han, chapter in queries:
+        linear_page_for(page_mapping, book_han, chapter)
+    linear_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for book_han, chapter in queries:
+        page_index.page_for(book_han, chapter)
+    index_time = time.perf_counter() - start
+
+    print(f"\n查詢 {len(queries)} 次：逐頁掃描 {linear_time * 1000:.1f} ms，二分搜尋 {index_time * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
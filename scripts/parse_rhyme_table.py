@@ -10,9 +10,9 @@
 
 import openpyxl
 from openpyxl.styles import Border
-import json
 import os
 import sys
+from json_artifacts import write_json, print_size_report
 
 def is_cell_merged(ws, row, col):
     """檢查儲存格是否為合併儲存格的一部分"""
@@ -264,8 +264,9 @@ def main():
     os.makedirs('website/src/data', exist_ok=True)
 
     # 儲存為 JSON
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # --production: minified；此檔由 Vite 打包進 JS，不需要 .gz / .br
+    production = '--production' in sys.argv[1:]
+    print_size_report([write_json(output_file, data, production=production, compress=False)])
 
     print(f"資料已儲存至 {output_file}")
 
@@ -6,12 +6,33 @@
 """
 
 import re
+import os
 import json
-import sys
-import shutil
+import hashlib
+from array import array
+import argparse
 from pathlib import Path
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 import unicodedata
 from book_info import ALL_BOOKS, HAN_TO_ROM, ROM_TO_HAN, HAN_TO_ENG
+from corpus_writer import StreamingCorpusWriter, ShardedCorpusWriter
+from json_artifacts import print_size_report
+from build_profile import BuildProfiler, NULL_PROFILER
+from rom_normalize import build_fold_table, fold_text
+from search_index import DEFAULT_INDEX_DIR, WEBSITE_INDEX_DIR, SearchIndexBuilder
+
+# tokenize / align 規則有改動時遞增，讓舊的對齊快取失效
+TOKENIZER_VERSION = 1
+
+DEFAULT_CACHE_FILE = 'data/align-cache.json'
+
+# 平行建置時每個工作最多處理的章數
+CHAPTERS_PER_TASK = 10
+
+# 分冊輸出目錄
+DEFAULT_SHARD_DIR = 'data/bible'
+WEBSITE_SHARD_DIR = 'website/public/bible'
 
 def number_to_chinese(n):
     """阿拉伯數字轉漢字"""
@@ -42,118 +63,143 @@ def number_to_chinese(n):
         return str(n)  # 超過1000就用阿拉伯數字
 
 
+# 羅馬字標點（包含 ASCII 和 Unicode 引號）
+ROM_PUNCT = '.,;:!?\'"()[]…—\u201C\u201D\u2018\u2019'
+# 漢字標點（包含中文和 Unicode 引號）
+HAN_PUNCT = '。，、；：！？（）「」『』【】…"\u201C\u201D\u2018\u2019'
+# 專名內部視為標點的字元
+PROPER_NAME_PUNCT = '。，、；：！？（）「」…'
+
+# 羅馬字：標點一律換成空格，再以空格切詞
+_ROM_PUNCT_TABLE = str.maketrans({c: ' ' for c in ROM_PUNCT})
+
+_HAN_PUNCT_SET = frozenset(HAN_PUNCT)
+
+# 漢字：專名 {…} 與合音字 「…」，其餘字元在標記之間逐字判斷
+_HAN_MARKUP_RE = re.compile(r'\{([^}]*)\}|「([^」]*)」')
+_PROPER_NAME_RE = re.compile(r'\{([^}]*)\}')
+_COMPOUND_RE = re.compile(r'「([^」]*)」')
+
+
 def tokenize_rom(text):
     """
     將羅馬字文本分割為詞 tokens
-    返回：[{'type': 'word', 'text': 'Kî-táu'}, {'type': 'punct', 'text': ','}, ...]
+    返回：[{'type': 'word', 'text': 'Kî-táu'}, ...]
+    標點不添加到 tokens，因為漢字版標點不同
     """
     tokens = []
-    i = 0
-    current_word = ""
-
-    while i < len(text):
-        char = text[i]
-
-        # 標點符號（包含 ASCII 和 Unicode 引號）
-        if char in '.,;:!?\'"()[]""''…—""''\u201C\u201D\u2018\u2019':
-            # 保存當前詞
-            if current_word.strip():
-                tokens.append({
-                    'type': 'word',
-                    'text': current_word.strip()
-                })
-                current_word = ""
-
-            # 跳過標點（不添加到 tokens，因為漢字版標點不同）
-            i += 1
-            continue
-
-        # 空格：詞的分界
-        if char == ' ':
-            if current_word.strip():
-                tokens.append({
-                    'type': 'word',
-                    'text': current_word.strip()
-                })
-                current_word = ""
-            i += 1
-            continue
-
-        # 一般字符
-        current_word += char
-        i += 1
+    for word in text.translate(_ROM_PUNCT_TABLE).split(' '):
+        word = word.strip()
+        if word:
+            tokens.append({'type': 'word', 'text': word})
+    return tokens
 
-    # 保存最後的詞
-    if current_word.strip():
-        tokens.append({
-            'type': 'word',
-            'text': current_word.strip()
-        })
 
-    return tokens
+def _tokenize_han_plain(text):
+    """無標記片段：標點或一般漢字，跳過空白（未配對的 { 當作一般字、「 當作標點）"""
+    return [
+        {'type': 'punct' if c in _HAN_PUNCT_SET else 'char', 'text': c}
+        for c in text if not c.isspace()
+    ]
 
 
-def tokenize_han(text):
+def tokenize_han(text, markup=None):
     """
     將漢字文本分割為 tokens
+    markup: strip_markup(text) 的結果，已有時傳入可避免重新掃描
     返回：[{'type': 'char', 'text': '起'}, {'type': 'compound', 'text': '第一', 'chars': ['第', '一']}, ...]
     """
+    clean_text, proper_names, compounds = markup if markup is not None else strip_markup(text)
+
+    if not proper_names and not compounds:
+        return _tokenize_han_plain(clean_text)
+
+    # 依位置合併兩種標記（長度為 0 的標記排在同位置的其他標記之前）
+    spans = sorted(
+        [(proper_names[i], proper_names[i + 1], True) for i in range(0, len(proper_names), 2)]
+        + [(compounds[i], compounds[i + 1], False) for i in range(0, len(compounds), 2)]
+    )
+
     tokens = []
-    i = 0
-
-    while i < len(text):
-        char = text[i]
-
-        # 專名標記（跳過）
-        if char == '{':
-            end = text.find('}', i)
-            if end != -1:
-                # 找到專名，記錄專名內容
-                proper_name = text[i+1:end]
-                # 拆分專名中的每個字
-                for c in proper_name:
-                    if c in '。，、；：！？（）「」…':
-                        tokens.append({'type': 'punct', 'text': c})
-                    elif c.strip():
-                        tokens.append({'type': 'char', 'text': c, 'proper_name': True})
-                i = end + 1
-                continue
+    pos = 0
 
-        # 合音字開始（「」標記）
-        if char == '「':
-            end = text.find('」', i)
-            if end != -1:
-                compound = text[i+1:end]
-                tokens.append({
-                    'type': 'compound',
-                    'text': compound,
-                    'chars': list(compound)
-                })
-                i = end + 1
-                continue
+    for start, length, is_proper_name in spans:
+        tokens.extend(_tokenize_han_plain(clean_text[pos:start]))
+        pos = start + length
+        content = clean_text[start:pos]
 
-        # 標點符號（包含中文和 Unicode 引號）
-        if char in '。，、；：！？（）「」『』【】…""''\u201C\u201D\u2018\u2019':
+        if is_proper_name:
+            # 專名標記：拆分專名中的每個字
+            for c in content:
+                if c in PROPER_NAME_PUNCT:
+                    tokens.append({'type': 'punct', 'text': c})
+                elif c.strip():
+                    tokens.append({'type': 'char', 'text': c, 'proper_name': True})
+        else:
+            # 合音字（「」標記）
             tokens.append({
-                'type': 'punct',
-                'text': char
+                'type': 'compound',
+                'text': content,
+                'chars': list(content)
             })
-            i += 1
-            continue
 
-        # 空白
-        if char.strip() == '':
-            i += 1
-            continue
+    tokens.extend(_tokenize_han_plain(clean_text[pos:]))
+    return tokens
 
-        # 一般漢字
-        tokens.append({
-            'type': 'char',
-            'text': char
-        })
-        i += 1
 
-    return tokens
+def strip_markup(han_text):
+    """
+    單次掃描移除專名標記 {...} 與合音字標記 「...」
+    標記不巢狀：專名內的 「」 視為普通字元，沒有配對的 { 或 「 保留原樣
+    返回：(乾淨文本, 專名位置, 合音字位置)
+    位置為 array('I') 扁平陣列 [起點, 長度, 起點, 長度, ...]，以乾淨文本計
+    """
+    proper_names = array('I')
+    compounds = array('I')
+
+    if '{' not in han_text and '「' not in han_text:
+        return han_text, proper_names, compounds
+
+    parts = []
+    clean_len = 0
+    pos = 0
+
+    for m in _HAN_MARKUP_RE.finditer(han_text):
+        plain = han_text[pos:m.start()]
+        parts.append(plain)
+        clean_len += len(plain)
+        pos = m.end()
+
+        proper_name = m.group(1)
+        content = proper_name if proper_name is not None else m.group(2)
+        target = proper_names if proper_name is not None else compounds
+        target.append(clean_len)
+        target.append(len(content))
+        parts.append(content)
+        clean_len += len(content)
+
+    parts.append(han_text[pos:])
+    return ''.join(parts), proper_names, compounds
+
+
+def _extract_markup(han_text, pattern):
+    """移除單一種標記，返回：(乾淨文本, {位置: 長度})"""
+    found = {}  # {start_pos: length}
+    parts = []
+    clean_len = 0
+    pos = 0
+
+    for m in pattern.finditer(han_text):
+        plain = han_text[pos:m.start()]
+        content = m.group(1)
+        parts.append(plain)
+        parts.append(content)
+        found[clean_len + len(plain)] = len(content)
+        clean_len += len(plain) + len(content)
+        pos = m.end()
+
+    parts.append(han_text[pos:])
+    return ''.join(parts), found
 
 
 def extract_proper_names(han_text):
@@ -161,33 +207,7 @@ def extract_proper_names(han_text):
     提取專名標記 {...}
     返回：(乾淨文本, {位置: 長度})
     """
-    proper_names = {}  # {start_pos: length}
-    clean_text = ""
-    offset = 0
-
-    i = 0
-    while i < len(han_text):
-        if han_text[i] == '{':
-            # 找到專名開始
-            j = i + 1
-            while j < len(han_text) and han_text[j] != '}':
-                j += 1
-
-            if j < len(han_text):
-                # 找到配對的 }
-                proper_name = han_text[i+1:j]
-                proper_names[len(clean_text)] = len(proper_name)
-                clean_text += proper_name
-                i = j + 1
-            else:
-                # 沒有配對，保留 {
-                clean_text += han_text[i]
-                i += 1
-        else:
-            clean_text += han_text[i]
-            i += 1
-
-    return clean_text, proper_names
+    return _extract_markup(han_text, _PROPER_NAME_RE)
 
 
 def extract_compound_chars(han_text):
@@ -195,40 +215,16 @@ def extract_compound_chars(han_text):
     提取合音字標記 「...」
     返回：(乾淨文本, {位置: 長度})
     """
-    compounds = {}  # {start_pos: length}
-    clean_text = ""
-
-    i = 0
-    while i < len(han_text):
-        if han_text[i] == '「':
-            # 找到合音字開始
-            j = i + 1
-            while j < len(han_text) and han_text[j] != '」':
-                j += 1
-
-            if j < len(han_text):
-                # 找到配對的 」
-                compound = han_text[i+1:j]
-                compounds[len(clean_text)] = len(compound)
-                clean_text += compound
-                i = j + 1
-            else:
-                # 沒有配對，保留 「
-                clean_text += han_text[i]
-                i += 1
-        else:
-            clean_text += han_text[i]
-            i += 1
-
-    return clean_text, compounds
+    return _extract_markup(han_text, _COMPOUND_RE)
 
 
-def align_tokens(han_text, rom_text):
+def align_tokens(han_text, rom_text, markup=None):
     """
     對齊漢字和羅馬字，生成 token 陣列 (重構版)
     以羅馬字詞為單位進行遍歷，來解決包含合音字的 phrase 的對齊問題
+    markup: strip_markup(han_text) 的結果（可選）
     """
-    han_tokens = tokenize_han(han_text)
+    han_tokens = tokenize_han(han_text, markup)
     rom_tokens = tokenize_rom(rom_text)
 
     aligned = []
@@ -298,118 +294,319 @@ def align_tokens(han_text, rom_text):
     return aligned
 
 
-def parse_structured_text(file_path):
+class AlignmentCache:
     """
-    解析格式化的文本文件
-    返回：{book_name: {chapter_num: {section_titles: [...], verses: {verse_num: text}}}}
+    逐節對齊結果的磁碟快取
+    key 為 (漢字節文, 羅馬字節文, TOKENIZER_VERSION) 的雜湊，value 為 align_tokens 的結果
+    只有內容改動的經節需要重新對齊
     """
-    with open(file_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
 
-    result = {}
+    def __init__(self, path=DEFAULT_CACHE_FILE, entries=None):
+        """entries 不為 None 時直接使用（平行建置的子程序），不讀取檔案"""
+        self.path = Path(path) if path is not None else None
+        self.entries = entries if entries is not None else {}
+        self.used = {}
+        self.hits = 0
+        self.misses = 0
+
+        if entries is None and self.path is not None and self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == TOKENIZER_VERSION:
+                    self.entries = data.get('entries', {})
+            except (OSError, ValueError) as e:
+                print(f"  警告: 無法讀取對齊快取 {self.path}: {e}")
+
+    @staticmethod
+    def make_key(han_text, rom_text):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{TOKENIZER_VERSION}\0{han_text}\0{rom_text}".encode('utf-8'))
+        return h.hexdigest()
+
+    def align(self, han_text, rom_text, markup=None):
+        """同 align_tokens，但先查快取"""
+        key = self.make_key(han_text, rom_text)
+        tokens = self.entries.get(key)
+        if tokens is None:
+            tokens = align_tokens(han_text, rom_text, markup)
+            self.misses += 1
+        else:
+            self.hits += 1
+        self.used[key] = tokens
+        return tokens
+
+    def merge(self, used, hits, misses):
+        """合併子程序回傳的使用紀錄與統計"""
+        self.used.update(used)
+        self.hits += hits
+        self.misses += misses
+
+    def save(self):
+        """寫回快取（只保留本次用到的經節），先寫暫存檔再改名"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': TOKENIZER_VERSION, 'entries': self.used}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def report(self):
+        total = self.hits + self.misses
+        print(f"  對齊快取: 命中 {self.hits} / {total} 節，重新對齊 {self.misses} 節")
+
+
+# 串流解析事件
+# kind: 'book' / 'chapter' / 'section_title' / 'verse'
+# text: 段落小標或經文（續行以 \n 接在後面）；不適用的欄位為 None
+TextEvent = namedtuple('TextEvent', ['kind', 'book', 'chapter', 'verse', 'text'])
+
+_VERSE_LINE_RE = re.compile(r'^(\d+)\s+(.*)')
+
+
+def iter_structured_text(file_path):
+    """
+    逐行串流解析格式化的文本文件，依序產生 TextEvent
+    不會一次讀入整個檔案；章號之前出現的段落小標，會在該章的 chapter 事件之後送出
+    """
     current_book = None
     current_chapter = None
-    current_verse_buffer = []
+    verse_buffer = None  # [節號, 經文片段, ...]
     pending_section_titles = []  # 暫存在章節之前出現的段落小標
 
     def flush_verse():
         """完成當前節的收集"""
-        if current_verse_buffer and current_book and current_chapter is not None:
-            verse_num = current_verse_buffer[0]
-            verse_text = ''.join(current_verse_buffer[1:])
+        nonlocal verse_buffer
+        if verse_buffer and current_book and current_chapter is not None:
+            event = TextEvent('verse', current_book, current_chapter, verse_buffer[0], ''.join(verse_buffer[1:]))
+            verse_buffer = None
+            return event
+        return None
 
-            if current_chapter not in result[current_book]['chapters']:
-                result[current_book]['chapters'][current_chapter] = {
-                    'section_titles': [],
-                    'verses': {}
-                }
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+
+            # 空行
+            if not line.strip():
+                event = flush_verse()
+                if event:
+                    yield event
+                continue
 
-            result[current_book]['chapters'][current_chapter]['verses'][verse_num] = verse_text
-            current_verse_buffer.clear()
+            # 一級標題：書名
+            if line.startswith('# '):
+                event = flush_verse()
+                if event:
+                    yield event
+                current_book = unicodedata.normalize('NFC', line[2:].strip())
+                current_chapter = None
+                pending_section_titles = []
+                yield TextEvent('book', current_book, None, None, None)
+                continue
 
-    for line in lines:
-        line = line.rstrip('\n')
+            # 三級標題：段落小標
+            if line.startswith('### '):
+                event = flush_verse()
+                if event:
+                    yield event
+                section_title = line[4:].strip()
+                if current_book and current_chapter is not None:
+                    yield TextEvent('section_title', current_book, current_chapter, None, section_title)
+                elif current_book:
+                    # 章節還未出現，暫存
+                    pending_section_titles.append(section_title)
+                continue
 
-        # 空行
-        if not line.strip():
-            flush_verse()
-            continue
+            # 二級標題：章號
+            if line.startswith('## '):
+                event = flush_verse()
+                if event:
+                    yield event
+                try:
+                    current_chapter = int(line[3:].strip())
+                except ValueError:
+                    continue
+                if current_book:
+                    yield TextEvent('chapter', current_book, current_chapter, None, None)
+                    # 將暫存的段落小標添加到這個章節
+                    for section_title in pending_section_titles:
+                        yield TextEvent('section_title', current_book, current_chapter, None, section_title)
+                    pending_section_titles = []
+                continue
 
-        # 一級標題：書名
-        if line.startswith('# '):
-            flush_verse()
-            book_name = unicodedata.normalize('NFC', line[2:].strip())
-            current_book = book_name
-            result[current_book] = {'chapters': {}}
-            current_chapter = None
-            pending_section_titles = []
-            continue
+            # 經節行
+            match = _VERSE_LINE_RE.match(line)
+            if match:
+                event = flush_verse()
+                if event:
+                    yield event
+                verse_buffer = [int(match.group(1)), match.group(2)]
+            elif verse_buffer:
+                # 續行（詩歌體）
+                verse_buffer.append('\n' + line)
 
-        # 三級標題：段落小標
-        if line.startswith('### '):
-            flush_verse()
-            section_title = line[4:].strip()
-            if current_book and current_chapter is not None:
-                # 章節已經存在，直接添加
-                if current_chapter not in result[current_book]['chapters']:
-                    result[current_book]['chapters'][current_chapter] = {
-                        'section_titles': [],
-                        'verses': {}
-                    }
-                result[current_book]['chapters'][current_chapter]['section_titles'].append(section_title)
-            elif current_book:
-                # 章節還未出現，暫存
-                pending_section_titles.append(section_title)
-            continue
+    # 處理最後一節
+    event = flush_verse()
+    if event:
+        yield event
 
-        # 二級標題：章號
-        if line.startswith('## '):
-            flush_verse()
-            chapter_str = line[3:].strip()
-            try:
-                current_chapter = int(chapter_str)
-                if current_book:
-                    if current_chapter not in result[current_book]['chapters']:
-                        result[current_book]['chapters'][current_chapter] = {
-                            'section_titles': [],
-                            'verses': {}
-                        }
-                    # 將暫存的段落小標添加到這個章節
-                    if pending_section_titles:
-                        result[current_book]['chapters'][current_chapter]['section_titles'].extend(pending_section_titles)
-                        pending_section_titles = []
-            except ValueError:
-                pass
+
+def parse_structured_text(file_path):
+    """
+    解析格式化的文本文件
+    返回：{book_name: {chapter_num: {section_titles: [...], verses: {verse_num: text}}}}
+    """
+    result = {}
+
+    for event in iter_structured_text(file_path):
+        if event.kind == 'book':
+            result[event.book] = {'chapters': {}}
             continue
 
-        # 經節行
-        match = re.match(r'^(\d+)\s+(.*)', line)
-        if match:
-            flush_verse()
-            verse_num = int(match.group(1))
-            verse_content = match.group(2)
-            current_verse_buffer = [verse_num, verse_content]
-        else:
-            # 續行（詩歌體）
-            if current_verse_buffer:
-                current_verse_buffer.append('\n' + line)
+        chapters = result[event.book]['chapters']
+        chapter = chapters.get(event.chapter)
+        if chapter is None:
+            chapter = chapters[event.chapter] = {'section_titles': [], 'verses': {}}
 
-    # 處理最後一節
-    flush_verse()
+        if event.kind == 'section_title':
+            chapter['section_titles'].append(event.text)
+        elif event.kind == 'verse':
+            chapter['verses'][event.verse] = event.text
 
     return result
 
 
+def build_chapter(chapter_num, han_chapter, rom_chapter, align=align_tokens):
+    """
+    合併一章的漢字與羅馬字資料
+    han_chapter / rom_chapter: parse_structured_text 的章節資料（可為 None）
+    返回：章節 dict，沒有任何內容時返回 None
+    """
+    chapter = {
+        "chapter": chapter_num,
+        "chapter_title_han": f"第{number_to_chinese(chapter_num)}章",
+        "chapter_title_rom": f"Dā̤ {chapter_num} Ca̤uⁿ",
+        "sections": []
+    }
+
+    han_verses = han_chapter.get('verses', {}) if han_chapter else {}
+    rom_verses = rom_chapter.get('verses', {}) if rom_chapter else {}
+    all_verse_nums = sorted(list(set(han_verses.keys()) | set(rom_verses.keys())))
+
+    if not all_verse_nums and not (han_chapter and han_chapter.get('section_titles')):
+        return None
+
+    if han_chapter and han_chapter.get('section_titles'):
+        for section_title_han in han_chapter['section_titles']:
+            chapter['sections'].append({
+                "type": "section_title", "han": section_title_han, "rom": "",
+                "tokens": align_tokens(section_title_han, "")
+            })
+
+    for verse_num in all_verse_nums:
+        han_text = han_verses.get(verse_num, "")
+        rom_text = rom_verses.get(verse_num, "")
+
+        han_clean, tokens = "", []
+        if han_text:
+            # 專名與合音字標記只掃描一次，結果同時給 tokenizer 使用
+            markup = strip_markup(han_text)
+            han_clean = markup[0]
+
+        if rom_text and han_text:
+            tokens = align(han_text, rom_text, markup)
+        elif rom_text:
+            tokens = tokenize_rom(rom_text)
+        elif han_text:
+            tokens = tokenize_han(han_text, markup)
+
+        chapter['sections'].append({
+            "type": "verse", "verse": verse_num, "rom": rom_text, "rom_folded": fold_text(rom_text),
+            "han": han_clean, "tokens": tokens
+        })
+
+    return chapter if chapter['sections'] else None
+
+
+def build_chapters(han_book_data, rom_book_data, chapter_nums, align=align_tokens):
+    """依序建立一卷書中指定的各章，略過沒有內容的章"""
+    han_chapters = han_book_data.get('chapters', {}) if han_book_data else {}
+    rom_chapters = rom_book_data.get('chapters', {}) if rom_book_data else {}
+
+    chapters = []
+    for chapter_num in chapter_nums:
+        chapter = build_chapter(chapter_num, han_chapters.get(chapter_num), rom_chapters.get(chapter_num), align)
+        if chapter is not None:
+            chapters.append(chapter)
+    return chapters
+
+
+def _book_chapters(han_data, rom_data, han_name, rom_name):
+    """返回：(漢字書卷資料, 羅馬字書卷資料, 排序後的章號)"""
+    han_book_data = han_data.get(han_name)
+    rom_book_data = rom_data.get(rom_name)
+
+    chapter_keys = set()
+    if han_book_data:
+        chapter_keys.update(han_book_data.get('chapters', {}).keys())
+    if rom_book_data:
+        chapter_keys.update(rom_book_data.get('chapters', {}).keys())
+
+    return han_book_data, rom_book_data, sorted(chapter_keys)
+
+
+# 平行建置：子程序內的快取內容（由 _init_worker 設定）
+_worker_cache_entries = None
+
+
+def _init_worker(cache_entries):
+    global _worker_cache_entries
+    _worker_cache_entries = cache_entries
+
+
+def _build_chapters_task(han_book_data, rom_book_data, chapter_nums):
+    """子程序工作：建立一批章節，返回 (章節, 用到的快取項目, 命中數, 未命中數)"""
+    if _worker_cache_entries is None:
+        return build_chapters(han_book_data, rom_book_data, chapter_nums), {}, 0, 0
 
+    cache = AlignmentCache(path=None, entries=_worker_cache_entries)
+    chapters = build_chapters(han_book_data, rom_book_data, chapter_nums, cache.align)
+    return chapters, cache.used, cache.hits, cache.misses
 
 
-def merge_and_generate_json(han_data, rom_data, output_file):
+def _submit_book_tasks(executor, han_data, rom_data):
     """
-    合併漢字和羅馬字資料，生成 bible_data.json
-    按照聖經書目順序（從 book_info.py 的 ALL_BOOKS）輸出
+    把一般書卷依章分批送進 process pool
+    大卷（如詩篇、以賽亞書）拆成多批，每批最多 CHAPTERS_PER_TASK 章
+    返回：{英文書名: [future, ...]}，future 依章序排列
+    """
+    futures = {}
+
+    for rom_name_orig, han_name_orig, eng_name, page in ALL_BOOKS:
+        if eng_name in ('Foreword', 'Preface'):
+            continue
+
+        rom_name = unicodedata.normalize('NFC', rom_name_orig)
+        han_name = unicodedata.normalize('NFC', han_name_orig)
+        han_book_data, rom_book_data, chapter_nums = _book_chapters(han_data, rom_data, han_name, rom_name)
+
+        futures[eng_name] = []
+        for i in range(0, len(chapter_nums), CHAPTERS_PER_TASK):
+            batch = chapter_nums[i:i + CHAPTERS_PER_TASK]
+            # 只傳這一批需要的章節，減少序列化的資料量
+            han_part = {'chapters': {n: han_book_data['chapters'][n] for n in batch if n in han_book_data['chapters']}} if han_book_data else None
+            rom_part = {'chapters': {n: rom_book_data['chapters'][n] for n in batch if n in rom_book_data['chapters']}} if rom_book_data else None
+            futures[eng_name].append(executor.submit(_build_chapters_task, han_part, rom_part, batch))
+
+    return futures
+
+
+def iter_books(han_data, rom_data, align=align_tokens, futures=None, cache=None):
+    """
+    按照 ALL_BOOKS 順序逐卷合併，每完成一卷就 yield 該卷
+    futures: 平行建置時由 _submit_book_tasks 送出的工作，None 表示在本程序內建立
+    cache: 平行建置時用來合併子程序的快取統計
     """
-    books = []
-    
     for rom_name_orig, han_name_orig, eng_name, page in ALL_BOOKS:
         rom_name = unicodedata.normalize('NFC', rom_name_orig)
         han_name = unicodedata.normalize('NFC', han_name_orig)
@@ -425,9 +622,10 @@ def merge_and_generate_json(han_data, rom_data, output_file):
                 paragraphs = [p.strip() for p in content.splitlines() if p.strip()]
                 sections = []
                 for i, para_text in enumerate(paragraphs):
-                    sections.append({ "type": "verse", "verse": i + 1, "rom": para_text, "han": "", "tokens": [] })
+                    sections.append({ "type": "verse", "verse": i + 1, "rom": para_text, "rom_folded": fold_text(para_text),
+                                      "han": "", "tokens": [] })
                 book['chapters'].append({ "chapter": 1, "chapter_title_han": "", "chapter_title_rom": "", "sections": sections })
-                books.append(book)
+                yield book
             except FileNotFoundError:
                 print(f"  警告: foreword-en.txt 不存在，已跳過")
             continue
@@ -452,129 +650,177 @@ def merge_and_generate_json(han_data, rom_data, output_file):
                 for i in range(num_lines):
                     rom_text = rom_lines[i] if i < len(rom_lines) else ""
                     han_text = han_lines[i] if i < len(han_lines) else ""
-                    han_clean, _ = extract_proper_names(han_text)
-                    han_clean, _ = extract_compound_chars(han_clean)
+                    markup = strip_markup(han_text)
 
                     sections.append({
-                        "type": "verse", "verse": i + 1, "rom": rom_text, "han": han_clean,
-                        "tokens": align_tokens(han_text, rom_text) if rom_text and han_text else []
+                        "type": "verse", "verse": i + 1, "rom": rom_text, "rom_folded": fold_text(rom_text),
+                        "han": markup[0],
+                        "tokens": align(han_text, rom_text, markup) if rom_text and han_text else []
                     })
                 book['chapters'].append({ "chapter": 1, "chapter_title_han": "", "chapter_title_rom": "", "sections": sections })
-                books.append(book)
+                yield book
             except FileNotFoundError:
                 print(f"  警告: foreword-cpx.txt 不存在，已跳過")
             continue
 
         # Case 3: 一般聖經書卷
-        han_book_data = han_data.get(han_name)
-        rom_book_data = rom_data.get(rom_name)
+        han_book_data, rom_book_data, chapter_nums = _book_chapters(han_data, rom_data, han_name, rom_name)
 
         if not han_book_data and not rom_book_data:
             print(f"  警告: {eng_name} 在 han.txt 和 rom.txt 中均未找到，已跳過")
             continue
 
-        chapter_keys = set()
-        if han_book_data:
-            chapter_keys.update(han_book_data.get('chapters', {}).keys())
-        if rom_book_data:
-            chapter_keys.update(rom_book_data.get('chapters', {}).keys())
-        
-        if not chapter_keys:
+        if not chapter_nums:
             continue
 
-        for chapter_num in sorted(list(chapter_keys)):
-            han_chapter = han_book_data.get('chapters', {}).get(chapter_num) if han_book_data else None
-            rom_chapter = rom_book_data.get('chapters', {}).get(chapter_num) if rom_book_data else None
-
-            chapter = {
-                "chapter": chapter_num,
-                "chapter_title_han": f"第{number_to_chinese(chapter_num)}章",
-                "chapter_title_rom": f"Dā̤ {chapter_num} Ca̤uⁿ",
-                "sections": []
-            }
-            
-            han_verses = han_chapter.get('verses', {}) if han_chapter else {}
-            rom_verses = rom_chapter.get('verses', {}) if rom_chapter else {}
-            all_verse_nums = sorted(list(set(han_verses.keys()) | set(rom_verses.keys())))
-
-            if not all_verse_nums and not (han_chapter and han_chapter.get('section_titles')):
-                continue
-
-            if han_chapter and han_chapter.get('section_titles'):
-                for section_title_han in han_chapter['section_titles']:
-                     chapter['sections'].append({
-                        "type": "section_title", "han": section_title_han, "rom": "",
-                        "tokens": align_tokens(section_title_han, "")
-                    })
+        if futures is not None:
+            for future in futures.pop(eng_name):
+                chapters, used, hits, misses = future.result()
+                book['chapters'].extend(chapters)
+                if cache is not None:
+                    cache.merge(used, hits, misses)
+        else:
+            book['chapters'] = build_chapters(han_book_data, rom_book_data, chapter_nums, align)
 
-            for verse_num in all_verse_nums:
-                han_text = han_verses.get(verse_num, "")
-                rom_text = rom_verses.get(verse_num, "")
-                
-                han_clean, tokens = "", []
-                if han_text:
-                    han_clean, _ = extract_proper_names(han_text)
-                    han_clean, _ = extract_compound_chars(han_text)
-
-                if rom_text and han_text:
-                    tokens = align_tokens(han_text, rom_text)
-                elif rom_text:
-                    tokens = tokenize_rom(rom_text)
-                elif han_text:
-                    tokens = tokenize_han(han_text)
-
-                chapter['sections'].append({
-                    "type": "verse", "verse": verse_num, "rom": rom_text, "han": han_clean,
-                    "tokens": tokens
-                })
-            
-            if chapter['sections']:
-                book['chapters'].append(chapter)
-        
         if book['chapters']:
-            books.append(book)
+            yield book
 
-    result = {"books": books}
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
 
-    website_output = Path('website/public/bible_data.json')
-    if website_output.parent.exists():
-        shutil.copy2(output_file, website_output)
-        print(f"\n  已複製至: {website_output}")
+def merge_and_generate_json(han_data, rom_data, output_file, cache=None, shard=None, shard_dir=DEFAULT_SHARD_DIR,
+                            compact=False, jobs=1, production=False, publish=True, profiler=NULL_PROFILER,
+                            search_dir=DEFAULT_INDEX_DIR):
+    """
+    合併漢字和羅馬字資料，生成 bible_data.json
+    按照聖經書目順序（從 book_info.py 的 ALL_BOOKS）輸出
+    cache: AlignmentCache，None 表示每節都重新對齊
+    shard: None 輸出單一檔案；'book' / 'chapter' 改為分冊輸出至 shard_dir
+    compact: 以欄式格式輸出 tokens（見 columnar_tokens.py）
+    jobs: 大於 1 時以 process pool 平行處理各書卷，輸出與單一程序完全相同
+    production: 輸出 minified JSON 及 .gz / .br 預壓縮檔
+    publish: 是否同時寫到 website/public/（效能測試等場合設為 False）
+    profiler: BuildProfiler，記錄各卷合併、對齊與寫出的耗時（見 build_profile.py）
+    search_dir: 檢索索引輸出目錄（見 search_index.py），None 表示不產生
+    每卷完成後立即寫到 output_file 與 website/public/（以暫存檔寫入，完成後才改名）
+    """
+    align = profiler.wrap('align_tokens', cache.align if cache is not None else align_tokens)
+
+    executor = None
+    futures = None
+    if jobs > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(cache.entries if cache is not None else None,)
+        )
+        futures = _submit_book_tasks(executor, han_data, rom_data)
+
+    if shard:
+        destinations = [shard_dir]
+        website_dir = Path(WEBSITE_SHARD_DIR)
+        writer_class = ShardedCorpusWriter
+        writer_options = {'per_chapter': shard == 'chapter', 'compact': compact, 'production': production}
     else:
-        print(f"\n  警告: website/public/ 目錄不存在，跳過複製")
+        destinations = [output_file]
+        website_dir = Path('website/public/bible_data.json')
+        writer_class = StreamingCorpusWriter
+        writer_options = {'compact': compact, 'production': production}
+
+    if publish and website_dir.parent.exists():
+        destinations.append(website_dir)
+    elif publish:
+        print(f"  警告: website/public/ 目錄不存在，只輸出至 {destinations[0]}")
+
+    search_builder = SearchIndexBuilder() if search_dir else None
+
+    books = profiler.timed_iter(iter_books(han_data, rom_data, align, futures, cache),
+                                lambda book: f"合併: {book['name_eng']}")
+    try:
+        with profiler.stage('合併並寫出 JSON（合計）'):
+            with writer_class(destinations, **writer_options) as writer:
+                for book in books:
+                    with profiler.stage('寫出 JSON（各卷）'):
+                        writer.add_book(book)
+                    if search_builder is not None:
+                        with profiler.stage('建立檢索索引'):
+                            search_builder.add_book(book)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    print(f"\n  已寫入: {', '.join(str(d) for d in destinations)}")
+    records = list(writer.records)
+
+    if search_builder is not None:
+        search_destinations = [search_dir]
+        if publish and Path(WEBSITE_INDEX_DIR).parent.exists():
+            search_destinations.append(WEBSITE_INDEX_DIR)
+        with profiler.stage('寫出檢索索引'):
+            records.extend(search_builder.write(search_destinations, production=production))
+        search_builder.report()
+        print(f"  已寫入: {', '.join(str(d) for d in search_destinations)}")
+
+    print_size_report(records)
 
     total_verses_han = sum(len(ch.get('verses', {})) for bk in han_data.values() for ch in bk.get('chapters', {}).values())
     total_verses_rom = sum(len(ch.get('verses', {})) for bk in rom_data.values() for ch in bk.get('chapters', {}).values())
 
+    if cache is not None:
+        with profiler.stage('儲存對齊快取'):
+            cache.save()
+
     print(f"\n解析完成")
-    print(f"  總書卷數: {len(books)}")
+    print(f"  總書卷數: {writer.book_count}")
     print(f"  總經節數 (han.txt): {total_verses_han}")
     print(f"  總經節數 (rom.txt): {total_verses_rom}")
-    print(f"  輸出檔案: {output_file}")
+    print(f"  輸出檔案: {shard_dir if shard else output_file}")
+    if cache is not None:
+        cache.report()
 
 
 def main():
-    han_file = 'data/han.txt'
-    rom_file = 'data/rom.txt'
-    output_file = 'data/bible_data.json'
-
-    if len(sys.argv) > 1:
-        han_file = sys.argv[1]
-    if len(sys.argv) > 2:
-        rom_file = sys.argv[2]
-    if len(sys.argv) > 3:
-        output_file = sys.argv[3]
+    parser = argparse.ArgumentParser(description='解析 han.txt / rom.txt，生成 bible_data.json')
+    parser.add_argument('han_file', nargs='?', default='data/han.txt')
+    parser.add_argument('rom_file', nargs='?', default='data/rom.txt')
+    parser.add_argument('output_file', nargs='?', default='data/bible_data.json')
+    parser.add_argument('--cache-file', default=DEFAULT_CACHE_FILE, help='對齊快取檔案')
+    parser.add_argument('--no-cache', action='store_true', help='不使用對齊快取，全部重新對齊')
+    parser.add_argument('--shard', choices=['book', 'chapter'], help='分冊輸出：每卷或每章一個檔案，另加 manifest.json')
+    parser.add_argument('--shard-dir', default=DEFAULT_SHARD_DIR, help='分冊輸出目錄')
+    parser.add_argument('--compact', action='store_true', help='tokens 改用欄式格式（平行陣列）輸出')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='平行處理的程序數（預設 1）')
+    parser.add_argument('--production', action='store_true', help='正式版輸出：minified JSON 及 .gz / .br 預壓縮檔')
+    parser.add_argument('--search-dir', default=DEFAULT_INDEX_DIR, help='檢索索引輸出目錄')
+    parser.add_argument('--no-search-index', action='store_true', help='不產生檢索索引')
+    parser.add_argument('--profile', action='store_true', help='記錄各階段與各卷的耗時，最後列出摘要表')
+    parser.add_argument('--profile-output', metavar='FILE', help='同時以 cProfile 記錄並寫出 pstats 檔（隱含 --profile）')
+    args = parser.parse_args()
+
+    profiler = BuildProfiler(cprofile_output=args.profile_output) if args.profile or args.profile_output else NULL_PROFILER
 
     print("解析漢字版 (han.txt)...")
-    han_data = parse_structured_text(han_file)
+    with profiler.stage('解析 han.txt'):
+        han_data = parse_structured_text(args.han_file)
 
     print("解析羅馬字版 (rom.txt)...")
-    rom_data = parse_structured_text(rom_file)
+    with profiler.stage('解析 rom.txt'):
+        rom_data = parse_structured_text(args.rom_file)
+
+    # 羅馬字檢索鍵：每個不同音節只摺疊一次，之後各節直接查表
+    with profiler.stage('羅馬字摺疊表'):
+        fold_table = build_fold_table(text for book in rom_data.values() for chapter in book['chapters'].values()
+                                      for text in chapter['verses'].values())
+    print(f"  羅馬字音節: {len(fold_table)} 個")
+
+    with profiler.stage('載入對齊快取'):
+        cache = None if args.no_cache else AlignmentCache(args.cache_file)
 
     print("合併並生成 JSON...")
-    merge_and_generate_json(han_data, rom_data, output_file)
+    merge_and_generate_json(han_data, rom_data, args.output_file, cache=cache,
+                            shard=args.shard, shard_dir=args.shard_dir, compact=args.compact,
+                            jobs=args.jobs, production=args.production, profiler=profiler,
+                            search_dir=None if args.no_search_index else args.search_dir)
+
+    profiler.print_summary()
 
 
 if __name__ == '__main__':
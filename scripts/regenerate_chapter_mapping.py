@@ -5,13 +5,18 @@
 用途：手動編輯 page-ocr-results.json 後，執行此腳本重新生成章節對應表
 """
 
+import sys
 import json
 from pathlib import Path
+from json_artifacts import write_json, print_size_report
+from page_index import build_page_index
 
 
-def generate_chapter_page_mapping(page_mapping: dict, output_file: str = 'data/chapter-page-mapping.json'):
+def generate_chapter_page_mapping(page_mapping: dict, output_file: str = 'data/chapter-page-mapping.json',
+                                  production: bool = False):
     """
     生成章節-頁碼對應表
+    production: 輸出 minified JSON 及 .gz / .br 預壓縮檔
 
     格式：
     {
@@ -83,8 +88,7 @@ def generate_chapter_page_mapping(page_mapping: dict, output_file: str = 'data/c
         }
 
     # 寫入檔案
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(chapter_mapping, f, ensure_ascii=False, indent=2)
+    print_size_report([write_json(output_file, chapter_mapping, production=production)])
 
     print(f"\n[OK] Generated chapter-page mapping: {output_file}")
 
@@ -116,9 +120,15 @@ if __name__ == '__main__':
 
     # 生成章節對應表
     print("\n[2] Generating chapter-page-mapping.json...")
-    chapter_mapping = generate_chapter_page_mapping(page_mapping)
+    production = '--production' in sys.argv[1:]
+    chapter_mapping = generate_chapter_page_mapping(page_mapping, production=production)
+
+    # 編譯網頁用的頁碼索引
+    print("\n[3] Compiling page-index.json...")
+    build_page_index(production=production)
 
     print("\n[DONE] Complete!")
     print("\nUsage:")
     print("  1. Edit data/page-ocr-results.json manually")
-    print("  2. Run this script to regenerate data/chapter-page-mapping.json")
+    print("  2. Run this script to regenerate data/chapter-page-mapping.json and page-index.json")
+    print("     (add --production for minified JSON with .gz / .br)")
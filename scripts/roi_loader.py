@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+只解碼圖片中需要的區域（region of interest）
+OCR 只用到頁首的一小塊，不必把整張高解析度 TIF 解碼到記憶體
+- 由 libtiff 解碼的 TIF（例如 Group 4 壓縮）：只讀出涵蓋區域的 strip，組成一個小 TIF 再解碼
+- Pillow 自己解碼的格式：只保留與區域相交的 strip / tile；未壓縮的單一 strip 只讀到區域的最下一列
+- JPEG：draft=True 時以 draft 模式直接解碼為縮小的影像
+其餘情況（或上述方式失敗時）退回完整解碼後裁切，結果相同
+
+用法: python scripts/roi_loader.py [圖片目錄] [--limit N]
+      比較完整解碼與區域解碼的每頁耗時與記憶體峰值
+"""
+
+import io
+import sys
+import time
+import struct
+import argparse
+import multiprocessing
+from pathlib import Path
+from PIL import Image, TiffImagePlugin, TiffTags
+
+DEFAULT_BOX = (400, 600, 1100, 1000)
+
+
+def _intersects(extents, box):
+    x0, y0, x1, y1 = extents
+    left, top, right, bottom = box
+    return x0 < right and left < x1 and y0 < bottom and top < y1
+
+
+def _restrict_decode(img, box):
+    """
+    調整尚未載入的 img，讓 load() 只解碼涵蓋 box 的部分（Pillow 自己解碼的格式）
+    返回：是否有調整
+    """
+    if len(img.tile) > 1:
+        # 各 strip / tile 分開解碼，其他部分不讀取，保持空白
+        img.tile = [tile for tile in img.tile if _intersects(tile[1], box)]
+        return True
+
+    if len(img.tile) == 1 and img.tile[0][0] == 'raw':
+        # 未壓縮：由上往下逐列讀取，把影像高度截到區域底部即可提早停止
+        decoder, (x0, y0, x1, y1), offset, args = img.tile[0][:4]
+        if (x0, y0) != (0, 0) or box[3] >= y1:
+            return False
+        img._size = (x1, box[3])
+        img.tile = [(decoder, (x0, y0, x1, box[3]), offset, args)]
+        return True
+
+    return False
+
+
+# 複製 IFD 時略過的 tag：strip 位置與高度會重新設定，指向其他 IFD 的 tag 無法沿用
+_STRIP_TAGS = {256, 257, 273, 278, 279}
+_POINTER_TAGS = {330, 34665, 34853, 40965}
+
+
+def _strip_subset(image_path, img, box):
+    """
+    由 libtiff 解碼的 TIF（例如 Group 4）：每個 strip 各自壓縮，
+    把涵蓋 box 的 strip 另外組成一個只有這幾列的小 TIF 再解碼
+    返回：(小 TIF 影像, 調整後的 box)；只有一個 strip 或不是 strip 格式時返回 None
+    """
+    tags = img.tag_v2
+    offsets = tags.get(273)
+    counts = tags.get(279)
+    if img.format != 'TIFF' or not offsets or len(offsets) < 2 or 322 in tags:
+        return None
+
+    rows = tags.get(278, img.height)
+    first = box[1] // rows
+    last = min((box[3] - 1) // rows, len(offsets) - 1)
+    if first == 0 and last == len(offsets) - 1:
+        return None
+
+    with open(image_path, 'rb') as f:
+        strips = []
+        for offset, count in zip(offsets[first:last + 1], counts[first:last + 1]):
+            f.seek(offset)
+            strips.append(f.read(count))
+
+    ifd = TiffImagePlugin.ImageFileDirectory_v2(prefix=b'II')
+    for tag, value in tags.items():
+        if tag not in _STRIP_TAGS and tag not in _POINTER_TAGS:
+            ifd[tag] = value
+            ifd.tagtype[tag] = tags.tagtype[tag]
+    ifd[256] = img.width
+    ifd[257] = min((last + 1) * rows, img.height) - first * rows
+    ifd[278] = rows
+    ifd[279] = tuple(len(strip) for strip in strips)
+    for tag in (256, 257, 278, 273, 279):
+        ifd.tagtype[tag] = TiffTags.LONG
+
+    # 檔案結構：檔頭、IFD、strip 資料
+    # tobytes() 會把 StripOffsets 加上 IFD 結尾的位置，這裡只需填入相對於 strip 資料開頭的位置
+    strip_offsets = []
+    data_offset = 0
+    for strip in strips:
+        strip_offsets.append(data_offset)
+        data_offset += len(strip)
+    ifd[273] = tuple(strip_offsets)
+
+    data = b'II*\x00' + struct.pack('<I', 8) + ifd.tobytes(8) + b''.join(strips)
+    y0 = first * rows
+    return Image.open(io.BytesIO(data)), (box[0], box[1] - y0, box[2], box[3] - y0)
+
+
+def load_region(image_path, box=DEFAULT_BOX, draft=False):
+    """
+    載入 image_path 中 box 範圍的影像
+    draft: 允許以縮小的解析度解碼（只有 JPEG 支援），用於快速的低解析度處理
+    返回：(裁切後的影像, 縮小倍數)；縮小倍數為 1 表示原解析度
+    """
+    img = Image.open(image_path)
+
+    if draft and img.format == 'JPEG':
+        width = img.width
+        img.draft('L', (img.width // 2, img.height // 2))
+        scale = width / img.width
+        if scale != 1:
+            return img.crop(tuple(int(v / scale) for v in box)), scale
+
+    size = (box[2] - box[0], box[3] - box[1])
+    try:
+        subset = _strip_subset(image_path, img, box) if img.tile and img.tile[0][0] == 'libtiff' else None
+        if subset is not None:
+            cropped = subset[0].crop(subset[1])
+        elif _restrict_decode(img, box):
+            cropped = img.crop(box)
+        else:
+            cropped = None
+        if cropped is not None and cropped.size == size:
+            return cropped, 1
+    except Exception:
+        pass
+
+    # 退回完整解碼
+    return Image.open(image_path).crop(box), 1
+
+
+def load_region_full(image_path, box=DEFAULT_BOX):
+    """原本的做法：完整解碼再裁切（比較用）"""
+    img = Image.open(image_path)
+    return img.crop(box)
+
+
+def _measure(args):
+    """子程序：依序載入所有圖片，返回 (每頁秒數, 記憶體峰值 KB 或 None)"""
+    mode, image_files, box = args
+    loader = load_region if mode == 'roi' else load_region_full
+    times = []
+    for image_file in image_files:
+        start = time.perf_counter()
+        region = loader(image_file, box)
+        if mode == 'roi':
+            region = region[0]
+        region.load()
+        times.append(time.perf_counter() - start)
+    # resource 只有 Unix 才有（Windows 上不列記憶體峰值）
+    try:
+        import resource
+    except ImportError:
+        return times, None
+    # Linux 的 ru_maxrss 單位為 KB，macOS 為 bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return times, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比較完整解碼與區域解碼')
+    parser.add_argument('image_dir', nargs='?', default='pics')
+    parser.add_argument('--limit', type=int, default=50, help='測試的頁數（預設 50）')
+    args = parser.parse_args()
+
+    image_files = sorted(str(p) for p in Path(args.image_dir).glob('*.tif'))[:args.limit]
+    if not image_files:
+        print(f"[ERROR] {args.image_dir} 中找不到 TIF 檔")
+        sys.exit(1)
+
+    # 每種方式在新的子程序中執行，記憶體峰值互不影響
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+    for mode in ('full', 'roi'):
+        with ctx.Pool(1) as pool:
+            results[mode] = pool.apply(_measure, ((mode, image_files, DEFAULT_BOX),))
+
+    # 兩種方式的結果必須相同
+    for image_file in image_files[:5]:
+        if load_region(image_file)[0].tobytes() != load_region_full(image_file).tobytes():
+            print(f"[ERROR] {image_file}: 區域解碼結果與完整解碼不同")
+            sys.exit(1)
+
+    print(f"測試 {len(image_files)} 頁")
+    print(f"\n{'方式':<12}{'平均 (ms/頁)':>14}{'最慢 (ms)':>12}{'記憶體峰值 (MB)':>18}")
+    for mode, label in (('full', '完整解碼'), ('roi', '區域解碼')):
+        times, peak = results[mode]
+        peak_text = f"{peak / 1024:.1f}" if peak is not None else '-'
+        print(f"{label:<12}{sum(times) / len(times) * 1000:>14.1f}{max(times) * 1000:>12.1f}{peak_text:>18}")
+
+
+if __name__ == '__main__':
+    main()
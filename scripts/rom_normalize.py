@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+羅馬字的檢索用正規化（摺疊）
+去掉所有附加符號與聲調：NFKD 分解後移除組合符號並轉小寫
+    Siō̤ng-Da̤̍ → siong-da，kua̍ⁿ → kuan，kṳ̍ → ku
+每個不同的音節只計算一次，結果存在對照表中重複使用
+
+用法: python scripts/rom_normalize.py [rom.txt]
+      列出 rom.txt 所有音節的摺疊結果統計
+"""
+
+import re
+import sys
+import unicodedata
+
+# 羅馬字音節：字母加上組合附加符號（o̤、a̍ 等沒有預組字形）
+SYLLABLE_RE = re.compile(r'(?:[^\W_]|[\u0300-\u036f])+')
+
+# {原音節: 摺疊後的音節}
+_fold_table = {}
+
+
+def _fold(syllable):
+    decomposed = unicodedata.normalize('NFKD', syllable)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def fold_syllable(syllable):
+    """單一音節 → 摺疊後的檢索鍵"""
+    folded = _fold_table.get(syllable)
+    if folded is None:
+        folded = _fold_table[syllable] = _fold(syllable)
+    return folded
+
+
+def fold_text(text):
+    """整段羅馬字 → 摺疊後的文字（音節以外的空白、連字號、標點保留不變）"""
+    return SYLLABLE_RE.sub(lambda m: fold_syllable(m.group()), text)
+
+
+def build_fold_table(texts):
+    """
+    預先計算 texts 中所有音節的摺疊結果
+    返回：摺疊對照表 {原音節: 摺疊後}
+    """
+    for text in texts:
+        for syllable in SYLLABLE_RE.findall(text):
+            fold_syllable(syllable)
+    return _fold_table
+
+
+def main():
+    from parse_text_v4 import iter_structured_text
+
+    rom_file = sys.argv[1] if len(sys.argv) > 1 else 'data/rom.txt'
+    table = build_fold_table(event.text for event in iter_structured_text(rom_file) if event.kind == 'verse')
+
+    groups = {}
+    for syllable, folded in table.items():
+        groups.setdefault(folded, set()).add(syllable.lower())
+
+    print(f"不同音節: {len(table)}，摺疊後: {len(groups)}")
+    print("\n同一檢索鍵最多的音節：")
+    for folded, syllables in sorted(groups.items(), key=lambda item: len(item[1]), reverse=True)[:10]:
+        print(f"  {folded}: {' '.join(sorted(syllables))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+建置時產生的全文檢索索引（倒排索引），網頁只需載入查詢字所在的分片
+- 漢字：每段連續漢字的單字與相鄰兩字（bigram）
+- 羅馬字：摺疊後的音節（去掉附加符號與聲調並轉小寫，見 rom_normalize.py），
+  輸入 Siong-Da 也能找到 Siō̤ng-Da̤̍
+每個鍵對應一串經節編號（pack_ref），由小到大排序後以差值儲存
+
+輸出目錄結構：
+    manifest.json      {"version", "han_shards", "rom_shards", "books"}
+    han/NN.json        {鍵: [差值, ...]}，NN = 首字碼位 % HAN_SHARD_COUNT
+    rom/x.json         {鍵: [差值, ...]}，x = 首字母 a-z（其餘為 _）
+
+用法: python scripts/search_index.py [bible_data.json] [查詢字 ...]
+      建立索引，並比較索引查詢與逐節掃描（SearchBox.jsx 目前的做法）的耗時
+"""
+
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+import unicodedata
+from pathlib import Path
+from book_info import ALL_BOOKS, ENG_TO_INDEX
+from json_artifacts import remove_compressed, sum_records, write_json
+from rom_normalize import SYLLABLE_RE, fold_syllable, fold_text
+
+INDEX_VERSION = 2
+HAN_SHARD_COUNT = 64
+
+DEFAULT_INDEX_DIR = 'data/search'
+WEBSITE_INDEX_DIR = 'website/public/search'
+
+# 漢字：連續的文字字元（標點、空白隔開）
+_HAN_RUN_RE = re.compile(r'[^\W_]+')
+# 查詢字含有 CJK 區段的字元時視為漢字查詢
+_HAN_CHAR_RE = re.compile(r'[\u2e80-\U0002ffff]')
+
+DEFAULT_QUERIES = ['上帝', '天', '耶穌', '以色列', 'Siō̤ng-Da̤̍', 'Siong-Da', 'gô̤ng', 'gong', 'cûi', 'sī']
+
+
+def pack_ref(book_index, chapter, verse):
+    """(書卷索引, 章, 節) → 整數，依經文順序遞增"""
+    if not (0 <= chapter < 256 and 0 <= verse < 256):
+        raise ValueError(f"章節超出範圍: {chapter}:{verse}")
+    return (book_index << 16) | (chapter << 8) | verse
+
+
+def unpack_ref(ref):
+    """pack_ref 的逆運算"""
+    return ref >> 16, (ref >> 8) & 0xff, ref & 0xff
+
+
+def han_keys(han_text):
+    """漢字經文 → 單字與 bigram 的集合"""
+    keys = set()
+    for run in _HAN_RUN_RE.findall(han_text):
+        keys.update(run)
+        keys.update(run[i:i + 2] for i in range(len(run) - 1))
+    return keys
+
+
+def rom_syllables(rom_text):
+    """羅馬字經文 → 摺疊後的音節串列"""
+    return [fold_syllable(syllable) for syllable in SYLLABLE_RE.findall(rom_text)]
+
+
+def han_shard(key):
+    return f"{ord(key[0]) % HAN_SHARD_COUNT:02d}"
+
+
+def rom_shard(key):
+    return key[0] if 'a' <= key[0] <= 'z' else '_'
+
+
+def _encode_postings(refs):
+    refs = sorted(refs)
+    return [ref - prev for prev, ref in zip([0] + refs, refs)]
+
+
+def _decode_postings(gaps):
+    refs = []
+    ref = 0
+    for gap in gaps:
+        ref += gap
+        refs.append(ref)
+    return refs
+
+
+class SearchIndexBuilder:
+    """逐卷加入書卷，最後 write() 寫出所有分片"""
+
+    def __init__(self):
+        self.han = {}  # {鍵: set(ref)}
+        self.rom = {}
+        self.verse_count = 0
+
+    def add_book(self, book):
+        book_index = ENG_TO_INDEX[book['name_eng']]
+        for chapter in book['chapters']:
+            for section in chapter['sections']:
+                if section['type'] != 'verse':
+                    continue
+                ref = pack_ref(book_index, chapter['chapter'], section['verse'])
+                for key in han_keys(section.get('han', '')):
+                    self.han.setdefault(key, set()).add(ref)
+                for key in rom_syllables(section.get('rom', '')):
+                    self.rom.setdefault(key, set()).add(ref)
+                self.verse_count += 1
+
+    def _shards(self, postings, shard_of):
+        shards = {}
+        for key in sorted(postings):
+            shards.setdefault(shard_of(key), {})[key] = _encode_postings(postings[key])
+        return shards
+
+    def write(self, destinations, production=False):
+        """
+        寫出到各目的地目錄（先清除上一次的分片）
+        返回：production 時每個目的地一筆加總的大小紀錄（給 print_size_report 使用）
+        """
+        han_shards = self._shards(self.han, han_shard)
+        rom_shards = self._shards(self.rom, rom_shard)
+        manifest = {
+            "version": INDEX_VERSION,
+            "han_shards": HAN_SHARD_COUNT,
+            "rom_shards": sorted(rom_shards),
+            "books": [eng for rom, han, eng, page in ALL_BOOKS],
+        }
+
+        records = []
+        for dest in destinations:
+            dest = Path(dest)
+            _clear_index(dest)
+            files = [write_json(dest / kind / f"{name}.json", shard, production=production)
+                     for kind, shards in (('han', han_shards), ('rom', rom_shards))
+                     for name, shard in shards.items()]
+            files.append(write_json(dest / 'manifest.json', manifest, production=production))
+            if production:
+                records.append(sum_records(f"{dest}/ ({len(files)} 個檔案)", files))
+        return records
+
+    def report(self):
+        print(f"  檢索索引: {self.verse_count} 節，漢字鍵 {len(self.han)} 個，羅馬字音節 {len(self.rom)} 個")
+
+
+def _clear_index(index_dir):
+    for sub in ('han', 'rom'):
+        if (index_dir / sub).is_dir():
+            shutil.rmtree(index_dir / sub)
+    (index_dir / 'manifest.json').unlink(missing_ok=True)
+    remove_compressed(index_dir / 'manifest.json')
+
+
+class SearchIndex:
+    """讀取索引目錄，分片於第一次用到時才載入"""
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        self.index_dir = Path(index_dir)
+        with open(self.index_dir / 'manifest.json', 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != INDEX_VERSION:
+            raise ValueError(f"不支援的索引版本: {self.manifest.get('version')}")
+        self._shards = {}
+
+    def _shard(self, kind, name):
+        if (kind, name) not in self._shards:
+            path = self.index_dir / kind / f"{name}.json"
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._shards[kind, name] = json.load(f)
+            else:
+                self._shards[kind, name] = {}
+        return self._shards[kind, name]
+
+    def _han_postings(self, key):
+        return set(_decode_postings(self._shard('han', han_shard(key)).get(key, [])))
+
+    def _rom_postings(self, syllable, prefix=False):
+        shard = self._shard('rom', rom_shard(syllable))
+        if not prefix:
+            return set(_decode_postings(shard.get(syllable, [])))
+        refs = set()
+        for key, gaps in shard.items():
+            if key.startswith(syllable):
+                refs.update(_decode_postings(gaps))
+        return refs
+
+    def candidates(self, term):
+        """
+        返回可能包含 term 的經節編號集合
+        漢字：所有 bigram（單字時為該字）的交集
+        羅馬字：各音節的交集，最後一個音節視為前綴（輸入中途也能找到）
+        """
+        term = unicodedata.normalize('NFC', term.strip())
+        if not term:
+            return set()
+
+        if _HAN_CHAR_RE.search(term):
+            keys = set()
+            for run in _HAN_RUN_RE.findall(term):
+                keys.update([run] if len(run) == 1 else (run[i:i + 2] for i in range(len(run) - 1)))
+            postings = [self._han_postings(key) for key in keys]
+        else:
+            syllables = rom_syllables(term)
+            postings = [self._rom_postings(s) for s in syllables[:-1]]
+            if syllables:
+                postings.append(self._rom_postings(syllables[-1], prefix=True))
+
+        if not postings:
+            return set()
+        return set.intersection(*postings)
+
+    def search(self, term, verses=None):
+        """
+        返回符合的經節編號（依經文順序）
+        verses: corpus_verses() 的結果，提供時以經文確認（羅馬字比對摺疊後的文字）
+                羅馬字只比對音節開頭，音節中間的片段不會命中
+        """
+        term = unicodedata.normalize('NFC', term.strip())
+        refs = self.candidates(term)
+        if verses is not None:
+            folded_term = fold_text(term)
+            refs = {ref for ref in refs
+                    if term in verses[ref][0] or folded_term in verses[ref][1]}
+        return sorted(refs)
+
+
+def corpus_verses(data):
+    """bible_data.json 內容 → {ref: (han, 摺疊後的 rom)}"""
+    verses = {}
+    for book in data['books']:
+        book_index = ENG_TO_INDEX[book['name_eng']]
+        for chapter in book['chapters']:
+            for section in chapter['sections']:
+                if section['type'] == 'verse':
+                    ref = pack_ref(book_index, chapter['chapter'], section['verse'])
+                    rom_folded = section.get('rom_folded')
+                    if rom_folded is None:
+                        rom_folded = fold_text(section.get('rom', ''))
+                    verses[ref] = (section.get('han', ''), rom_folded)
+    return verses
+
+
+def linear_search(data, term, folded=False):
+    """
+    與 SearchBox.jsx 相同的逐節掃描
+    folded: 改為比對 rom_folded（不分附加符號與聲調）
+    """
+    refs = []
+    rom_term = fold_text(term) if folded else term.lower()
+    rom_field = 'rom_folded' if folded else 'rom'
+    for book in data['books']:
+        book_index = ENG_TO_INDEX[book['name_eng']]
+        for chapter in book['chapters']:
+            for section in chapter['sections']:
+                if section['type'] != 'verse':
+                    continue
+                rom_text = section[rom_field] if folded else section['rom'].lower()
+                if rom_term in rom_text or term in section['han']:
+                    refs.append(pack_ref(book_index, chapter['chapter'], section['verse']))
+    return refs
+
+
+def _best_time(func, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    input_file = sys.argv[1] if len(sys.argv) > 1 else 'data/bible_data.json'
+    queries = sys.argv[2:] or DEFAULT_QUERIES
+
+    with open(input_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    builder = SearchIndexBuilder()
+    for book in data['books']:
+        builder.add_book(book)
+    builder.report()
+
+    verses = corpus_verses(data)
+
+    with tempfile.TemporaryDirectory(prefix='hinghua-search-') as index_dir:
+        builder.write([index_dir])
+        index = SearchIndex(index_dir)
+
+        print(f"\n{'查詢':<16}{'逐節掃描 (ms)':>14}{'索引/首次 (ms)':>16}{'索引/已載入 (ms)':>18}"
+              f"{'逐節結果':>10}{'摺疊逐節':>10}{'索引結果':>10}")
+        for term in queries:
+            linear_time, linear_refs = _best_time(lambda: linear_search(data, term))
+            folded_refs = linear_search(data, term, folded=True)
+            # 首次：每次都重新載入分片，相當於網頁第一次查詢；已載入：分片已在記憶體中
+            cold_time, index_refs = _best_time(lambda: SearchIndex(index_dir).search(term, verses))
+            warm_time, _ = _best_time(lambda: index.search(term, verses))
+            missing = set(index_refs) - set(folded_refs)
+            if missing:
+                print(f"[ERROR] {term}: 索引結果不在逐節掃描結果中: {sorted(missing)[:5]}")
+                sys.exit(1)
+            print(f"{term:<16}{linear_time * 1000:>14.3f}{cold_time * 1000:>16.3f}{warm_time * 1000:>18.3f}"
+                  f"{len(linear_refs):>10}{len(folded_refs):>10}{len(index_refs):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generate a DeepZoom-style tile pyramid for every scanned page
+
+For each page NNNN the output directory gets:
+    NNNN/info.json              descriptor (see build_descriptor)
+    NNNN/preview.webp           low-resolution preview (long side PREVIEW_SIZE)
+    NNNN/{level}/{col}_{row}.webp   fixed-size tiles
+
+Levels follow the DeepZoom convention: level L is the full image scaled by
+1 / 2^(max_level - L), with max_level = ceil(log2(max(width, height))).
+Only levels from the largest one that fits in a single tile upward are written;
+smaller zooms use the preview. Tiles are TILE_SIZE pixels plus OVERLAP pixels
+shared with each neighbour, so the viewer can fetch just the tiles in view.
+
+Pages whose source hash and tiling settings match the existing info.json are skipped.
+
+Usage: python scripts/tile_pyramid.py [input_dir] [output_dir] [--workers N] [--force]
+"""
+
+from PIL import Image
+import os
+import json
+import math
+import time
+import shutil
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from convert_images import file_hash
+
+DESCRIPTOR_VERSION = 1
+TILE_SIZE = 512
+OVERLAP = 1
+PREVIEW_SIZE = 512
+TILE_FORMAT = 'webp'
+
+
+def tile_settings(tile_size: int = TILE_SIZE, overlap: int = OVERLAP, quality: int = None) -> dict:
+    """
+    Tiling and encoder settings (recorded in info.json)
+
+    Args:
+        quality: Lossy WebP quality; None (default) encodes lossless, which is
+                 several times smaller for the bilevel scans
+    """
+    return {'tile_size': tile_size, 'overlap': overlap, 'format': TILE_FORMAT, 'quality': quality,
+            'preview_size': PREVIEW_SIZE}
+
+
+def level_sizes(width: int, height: int, tile_size: int) -> list:
+    """
+    [(level, width, height), ...] from the largest single-tile level up to full resolution
+    """
+    max_level = math.ceil(math.log2(max(width, height)))
+    levels = []
+    for level in range(max_level, -1, -1):
+        factor = 2 ** (max_level - level)
+        level_width, level_height = math.ceil(width / factor), math.ceil(height / factor)
+        levels.append((level, level_width, level_height))
+        if level_width <= tile_size and level_height <= tile_size:
+            break
+    return levels[::-1]
+
+
+def tile_boxes(width: int, height: int, tile_size: int, overlap: int):
+    """Yield (col, row, box) for each tile of a width x height level"""
+    for row in range(math.ceil(height / tile_size)):
+        for col in range(math.ceil(width / tile_size)):
+            left = max(col * tile_size - overlap, 0)
+            top = max(row * tile_size - overlap, 0)
+            right = min((col + 1) * tile_size + overlap, width)
+            bottom = min((row + 1) * tile_size + overlap, height)
+            yield col, row, (left, top, right, bottom)
+
+
+def build_descriptor(width: int, height: int, settings: dict, source_hash: str) -> dict:
+    """info.json contents"""
+    tile_size = settings['tile_size']
+    return {
+        'version': DESCRIPTOR_VERSION,
+        'width': width,
+        'height': height,
+        'tile_size': tile_size,
+        'overlap': settings['overlap'],
+        'format': settings['format'],
+        'preview': f"preview.{settings['format']}",
+        'levels': [
+            {'level': level, 'width': w, 'height': h,
+             'columns': math.ceil(w / tile_size), 'rows': math.ceil(h / tile_size)}
+            for level, w, h in level_sizes(width, height, tile_size)
+        ],
+        'source_hash': source_hash,
+        'settings': settings,
+    }
+
+
+def is_current(page_dir: Path, source_hash: str, settings: dict) -> bool:
+    try:
+        with open(page_dir / 'info.json', 'r', encoding='utf-8') as f:
+            descriptor = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (descriptor.get('version') == DESCRIPTOR_VERSION
+            and descriptor.get('source_hash') == source_hash
+            and descriptor.get('settings') == settings)
+
+
+def tile_page(source: Path, page_dir: Path, settings: dict, force: bool = False) -> tuple:
+    """
+    Write the pyramid for one page (runs in a worker process when --workers > 1)
+
+    Returns:
+        (tiles written, bytes written); (0, 0) if the page was up to date
+    """
+    source_hash = file_hash(source)
+    if not force and is_current(page_dir, source_hash, settings):
+        return 0, 0
+
+    # Build into a temporary directory and swap it in, so an interrupted run
+    # never leaves a half-written pyramid behind a valid info.json
+    tmp_dir = page_dir.with_name(page_dir.name + '.tmp')
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    if settings['quality'] is None:
+        save_options = {'lossless': True, 'method': 4}
+    else:
+        save_options = {'quality': settings['quality'], 'method': 4}
+    tile_size, overlap = settings['tile_size'], settings['overlap']
+
+    with Image.open(source) as img:
+        # Bilevel scans are resampled in grayscale so reduced levels stay legible
+        image = img.convert('L') if img.mode in ('1', 'P') else img.copy()
+    width, height = image.size
+
+    tiles = 0
+    total_bytes = 0
+    levels = level_sizes(width, height, tile_size)
+    # Walk from full resolution down, halving each time (ceil sizes match DeepZoom)
+    level_image = image
+    for level, level_width, level_height in reversed(levels):
+        while level_image.size != (level_width, level_height):
+            level_image = level_image.reduce(2)
+        level_dir = tmp_dir / str(level)
+        level_dir.mkdir()
+        for col, row, box in tile_boxes(level_width, level_height, tile_size, overlap):
+            tile_file = level_dir / f"{col}_{row}.{settings['format']}"
+            level_image.crop(box).save(tile_file, **save_options)
+            tiles += 1
+            total_bytes += tile_file.stat().st_size
+
+    preview = image.copy()
+    preview.thumbnail((settings['preview_size'], settings['preview_size']), Image.Resampling.LANCZOS)
+    preview_file = tmp_dir / f"preview.{settings['format']}"
+    preview.save(preview_file, **save_options)
+    total_bytes += preview_file.stat().st_size
+
+    with open(tmp_dir / 'info.json', 'w', encoding='utf-8') as f:
+        json.dump(build_descriptor(width, height, settings, source_hash), f, indent=1)
+
+    if page_dir.exists():
+        shutil.rmtree(page_dir)
+    os.replace(tmp_dir, page_dir)
+    return tiles, total_bytes
+
+
+def generate_pyramids(input_dir: str, output_dir: str, workers: int = 1, force: bool = False,
+                      settings: dict = None):
+    """
+    Tile every page image (*.tif or *.webp) in input_dir
+
+    Args:
+        input_dir: Directory with page images named by page number
+        output_dir: Output directory, one subdirectory per page
+        workers: Number of processes (1 = run in this process)
+        force: Regenerate pages even if their info.json is up to date
+        settings: tile_settings() result
+    """
+    settings = settings or tile_settings()
+    input_path = Path(input_dir)
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    sources = sorted(input_path.glob('*.tif')) or sorted(input_path.glob('*.webp'))
+    print(f"Found {len(sources)} pages in {input_dir}")
+    print(f"Tiling to {output_dir} ({settings['tile_size']}px tiles, {workers} worker(s))...\n")
+
+    started = time.perf_counter()
+    jobs = [(source, output_path / source.stem, settings, force) for source in sources]
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if executor is None:
+            results = (tile_page(*job) for job in jobs)
+        else:
+            results = executor.map(tile_page, *zip(*jobs)) if jobs else []
+
+        tiled = skipped = total_tiles = total_bytes = 0
+        for i, (tiles, page_bytes) in enumerate(results, 1):
+            if tiles:
+                tiled += 1
+                total_tiles += tiles
+                total_bytes += page_bytes
+            else:
+                skipped += 1
+            if i % 100 == 0 or i == len(jobs):
+                print(f"[{i}/{len(jobs)}] tiled {tiled}, up to date {skipped}")
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    print("\n" + "="*60)
+    print("[DONE] Tiling complete!")
+    print(f"Tiled: {tiled}, skipped (up to date): {skipped}")
+    if tiled:
+        print(f"Tiles written: {total_tiles} ({total_tiles / tiled:.0f} per page), "
+              f"{total_bytes/1024/1024:.2f} MB ({total_bytes / tiled / 1024:.1f} KB per page)")
+    print(f"Elapsed: {elapsed:.1f} s ({tiled / elapsed if elapsed else 0:.1f} pages/sec)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate DeepZoom-style tile pyramids for scanned pages')
+    parser.add_argument('input_dir', nargs='?', default='pics')
+    parser.add_argument('output_dir', nargs='?', default='website/public/tiles')
+    parser.add_argument('--workers', '-w', type=int, default=os.cpu_count() or 1,
+                        help='Number of processes (default: CPU count)')
+    parser.add_argument('--tile-size', type=int, default=TILE_SIZE, help=f'Tile size in pixels (default {TILE_SIZE})')
+    parser.add_argument('--quality', type=int, default=None, help='Lossy WebP quality (default: lossless)')
+    parser.add_argument('--force', action='store_true', help='Regenerate all pages')
+    args = parser.parse_args()
+
+    generate_pyramids(args.input_dir, args.output_dir, workers=args.workers, force=args.force,
+                      settings=tile_settings(args.tile_size, OVERLAP, args.quality))